@@ -0,0 +1,176 @@
+"""Baseline schema: users, drivers, rides, deliveries
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Databases created before migrations existed (by `create_all` plus the
+startup ALTER TABLEs) already have these tables; for them this revision
+only adds whatever columns an older deployment may still be missing, so
+`alembic upgrade head` works on both fresh and existing databases.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Columns the old startup hook added to databases that predate them
+LEGACY_COLUMNS = [
+    "ALTER TABLE drivers ADD COLUMN IF NOT EXISTS online_status VARCHAR(20) DEFAULT 'offline'",
+    "ALTER TABLE drivers ADD COLUMN IF NOT EXISTS current_location_lat FLOAT",
+    "ALTER TABLE drivers ADD COLUMN IF NOT EXISTS current_location_lng FLOAT",
+    "ALTER TABLE drivers ADD COLUMN IF NOT EXISTS last_location_update TIMESTAMP",
+    "ALTER TABLE rides ADD COLUMN IF NOT EXISTS assigned_driver_id UUID REFERENCES drivers(id)",
+    "ALTER TABLE rides ADD COLUMN IF NOT EXISTS driver_response_deadline TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS idx_drivers_online_status ON drivers(online_status)",
+]
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("users"):
+        for statement in LEGACY_COLUMNS:
+            op.execute(statement)
+        return
+
+    op.create_table(
+        "users",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("phone", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("national_id", sa.String(), nullable=True),
+        sa.Column("role", sa.Enum("USER", "DRIVER", "ADMIN", name="userrole"), nullable=False),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_phone", "users", ["phone"], unique=True)
+
+    op.create_table(
+        "drivers",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("driver_type", sa.Enum("TAXI", "DELIVERY", name="drivertype"), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("national_id", sa.String(), nullable=False, unique=True),
+        sa.Column("phone", sa.String(), nullable=False),
+        sa.Column("phone_secondary", sa.String(), nullable=True),
+        sa.Column("age", sa.Integer(), nullable=False),
+        sa.Column("national_id_photo", sa.String(), nullable=False),
+        sa.Column("license_photo", sa.String(), nullable=False),
+        sa.Column("selfie_with_id_photo", sa.String(), nullable=False),
+        sa.Column(
+            "vehicle_type",
+            sa.Enum("SEDAN", "SUV", "VAN", "MOTORCYCLE", "BICYCLE", "CAR", name="vehicletype"),
+            nullable=False
+        ),
+        sa.Column("vehicle_brand", sa.String(), nullable=True),
+        sa.Column("vehicle_model", sa.String(), nullable=True),
+        sa.Column("vehicle_number", sa.String(), nullable=False),
+        sa.Column("vehicle_photo", sa.String(), nullable=False),
+        sa.Column("status", sa.Enum("PENDING", "APPROVED", "REJECTED", name="driverstatus"), nullable=False),
+        sa.Column("rejection_reason", sa.String(), nullable=True),
+        sa.Column(
+            "online_status",
+            sa.Enum("ONLINE", "IN_RIDE", "PAUSED", "OFFLINE", name="driveronlinestatus"),
+            nullable=False
+        ),
+        sa.Column("current_location_lat", sa.Float(), nullable=True),
+        sa.Column("current_location_lng", sa.Float(), nullable=True),
+        sa.Column("last_location_update", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_drivers_id", "drivers", ["id"])
+    op.create_index("ix_drivers_user_id", "drivers", ["user_id"], unique=True)
+    op.create_index("ix_drivers_status", "drivers", ["status"])
+    op.create_index("idx_drivers_online_status", "drivers", ["online_status"])
+
+    op.create_table(
+        "rides",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("driver_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("assigned_driver_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("drivers.id"), nullable=True),
+        sa.Column("driver_response_deadline", sa.DateTime(), nullable=True),
+        sa.Column("pickup_lat", sa.Float(), nullable=False),
+        sa.Column("pickup_lng", sa.Float(), nullable=False),
+        sa.Column("pickup_address", sa.String(), nullable=False),
+        sa.Column("destination_lat", sa.Float(), nullable=False),
+        sa.Column("destination_lng", sa.Float(), nullable=False),
+        sa.Column("destination_address", sa.String(), nullable=False),
+        sa.Column("distance_km", sa.Float(), nullable=False),
+        sa.Column("estimated_price", sa.Float(), nullable=False),
+        sa.Column("final_price", sa.Float(), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "MATCHED", "IN_PROGRESS", "COMPLETED", "CANCELLED", name="ridestatus"),
+            nullable=False
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_rides_id", "rides", ["id"])
+    op.create_index("ix_rides_user_id", "rides", ["user_id"])
+    op.create_index("ix_rides_driver_id", "rides", ["driver_id"])
+    op.create_index("ix_rides_assigned_driver_id", "rides", ["assigned_driver_id"])
+    op.create_index("ix_rides_status", "rides", ["status"])
+
+    op.create_table(
+        "deliveries",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("driver_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("order_type", sa.String(), nullable=False),
+        sa.Column("pickup_lat", sa.Float(), nullable=False),
+        sa.Column("pickup_lng", sa.Float(), nullable=False),
+        sa.Column("pickup_address", sa.String(), nullable=False),
+        sa.Column("pickup_details", sa.String(), nullable=True),
+        sa.Column("sender_name", sa.String(), nullable=False),
+        sa.Column("delivery_lat", sa.Float(), nullable=False),
+        sa.Column("delivery_lng", sa.Float(), nullable=False),
+        sa.Column("delivery_address", sa.String(), nullable=False),
+        sa.Column("delivery_details", sa.String(), nullable=True),
+        sa.Column("receiver_name", sa.String(), nullable=False),
+        sa.Column("receiver_phone", sa.String(), nullable=False),
+        sa.Column("receiver_national_id", sa.String(), nullable=False),
+        sa.Column("driver_pays", sa.Boolean(), nullable=False),
+        sa.Column("product_amount", sa.Float(), nullable=False),
+        sa.Column("distance_km", sa.Float(), nullable=False),
+        sa.Column("delivery_fee", sa.Float(), nullable=False),
+        sa.Column("total_cost", sa.Float(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum(
+                "PENDING", "MATCHED", "PICKED_UP", "IN_TRANSIT", "DELIVERED", "CANCELLED",
+                name="deliverystatus"
+            ),
+            nullable=False
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_deliveries_id", "deliveries", ["id"])
+    op.create_index("ix_deliveries_user_id", "deliveries", ["user_id"])
+    op.create_index("ix_deliveries_driver_id", "deliveries", ["driver_id"])
+    op.create_index("ix_deliveries_status", "deliveries", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_table("deliveries")
+    op.drop_table("rides")
+    op.drop_table("drivers")
+    op.drop_table("users")
+    for enum_name in (
+        "deliverystatus", "ridestatus", "driveronlinestatus", "driverstatus", "vehicletype", "drivertype", "userrole"
+    ):
+        sa.Enum(name=enum_name).drop(op.get_bind(), checkfirst=True)
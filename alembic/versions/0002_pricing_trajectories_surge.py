@@ -0,0 +1,76 @@
+"""Pricing rates, ride trajectories and surge multipliers
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Existing databases may already have these from `create_all` and the
+startup ALTER TABLEs; anything present is left as it is.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    for table in ("rides", "deliveries"):
+        if "surge_multiplier" not in {column["name"] for column in inspector.get_columns(table)}:
+            op.add_column(
+                table,
+                sa.Column("surge_multiplier", sa.Float(), nullable=False, server_default=sa.text("1.0"))
+            )
+
+    if not inspector.has_table("pricing_rates"):
+        op.create_table(
+            "pricing_rates",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column(
+                "driver_type",
+                postgresql.ENUM("TAXI", "DELIVERY", name="drivertype", create_type=False),
+                nullable=False
+            ),
+            sa.Column(
+                "vehicle_type",
+                postgresql.ENUM(
+                    "SEDAN", "SUV", "VAN", "MOTORCYCLE", "BICYCLE", "CAR",
+                    name="vehicletype", create_type=False
+                ),
+                nullable=True
+            ),
+            sa.Column("base_fare", sa.Float(), nullable=False),
+            sa.Column("per_km", sa.Float(), nullable=False),
+            sa.Column("minimum_fare", sa.Float(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_pricing_rates_id", "pricing_rates", ["id"])
+        op.create_index("ix_pricing_rates_driver_type", "pricing_rates", ["driver_type"])
+
+    if not inspector.has_table("ride_trajectories"):
+        op.create_table(
+            "ride_trajectories",
+            sa.Column("ride_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("rides.id"), primary_key=True),
+            sa.Column("started_at", sa.DateTime(), nullable=False),
+            sa.Column("point_count", sa.Integer(), nullable=False),
+            sa.Column("distance_km", sa.Float(), nullable=False),
+            sa.Column("points", sa.LargeBinary(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("ride_trajectories")
+    op.drop_table("pricing_rates")
+    op.drop_column("deliveries", "surge_multiplier")
+    op.drop_column("rides", "surge_multiplier")
@@ -0,0 +1,25 @@
+"""Index for paging the admin driver lists
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_drivers_status_created_at_id", "drivers", ["status", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_drivers_status_created_at_id", table_name="drivers")
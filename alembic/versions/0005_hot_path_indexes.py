@@ -0,0 +1,52 @@
+"""Partial indexes for available drivers and open ride offers
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Built CONCURRENTLY on Postgres so drivers and rides stay writable while
+the indexes are created. ix_drivers_available supersedes
+idx_drivers_online_status, which is dropped.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_drivers_available",
+            "drivers",
+            ["driver_type"],
+            postgresql_where=sa.text("status = 'APPROVED' AND online_status = 'ONLINE'"),
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            "ix_rides_pending_offers",
+            "rides",
+            ["assigned_driver_id", "driver_response_deadline"],
+            postgresql_where=sa.text("status = 'PENDING'"),
+            postgresql_concurrently=True
+        )
+        op.drop_index("idx_drivers_online_status", table_name="drivers", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_drivers_online_status",
+            "drivers",
+            ["online_status"],
+            postgresql_concurrently=True
+        )
+        op.drop_index("ix_rides_pending_offers", table_name="rides", postgresql_concurrently=True)
+        op.drop_index("ix_drivers_available", table_name="drivers", postgresql_concurrently=True)
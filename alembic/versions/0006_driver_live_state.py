@@ -0,0 +1,88 @@
+"""Driver live state table
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+Moves online status and location out of the wide drivers row into
+driver_live_state, so location pings stop rewriting driver profiles.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ONLINE_STATUS = postgresql.ENUM("ONLINE", "IN_RIDE", "PAUSED", "OFFLINE", name="driveronlinestatus", create_type=False)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "driver_live_state",
+        sa.Column(
+            "driver_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("drivers.id", ondelete="CASCADE"),
+            primary_key=True
+        ),
+        sa.Column("online_status", ONLINE_STATUS, nullable=False),
+        sa.Column("current_location_lat", sa.Float(), nullable=True),
+        sa.Column("current_location_lng", sa.Float(), nullable=True),
+        sa.Column("last_location_update", sa.DateTime(), nullable=True),
+    )
+
+    # Databases upgraded by the old startup ALTERs hold lowercase text here
+    op.execute(
+        "INSERT INTO driver_live_state "
+        "(driver_id, online_status, current_location_lat, current_location_lng, last_location_update) "
+        "SELECT id, "
+        "CASE WHEN upper(online_status::text) IN ('ONLINE', 'IN_RIDE', 'PAUSED', 'OFFLINE') "
+        "THEN upper(online_status::text)::driveronlinestatus ELSE 'OFFLINE' END, "
+        "current_location_lat, current_location_lng, last_location_update "
+        "FROM drivers"
+    )
+    op.create_index(
+        "ix_driver_live_state_online",
+        "driver_live_state",
+        ["driver_id"],
+        postgresql_where=sa.text("online_status = 'ONLINE'")
+    )
+
+    op.drop_index("ix_drivers_available", table_name="drivers")
+    op.drop_column("drivers", "last_location_update")
+    op.drop_column("drivers", "current_location_lng")
+    op.drop_column("drivers", "current_location_lat")
+    op.drop_column("drivers", "online_status")
+
+
+def downgrade() -> None:
+    op.add_column("drivers", sa.Column("online_status", ONLINE_STATUS, nullable=True))
+    op.add_column("drivers", sa.Column("current_location_lat", sa.Float(), nullable=True))
+    op.add_column("drivers", sa.Column("current_location_lng", sa.Float(), nullable=True))
+    op.add_column("drivers", sa.Column("last_location_update", sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE drivers AS d SET "
+        "online_status = COALESCE(l.online_status, 'OFFLINE'), "
+        "current_location_lat = l.current_location_lat, "
+        "current_location_lng = l.current_location_lng, "
+        "last_location_update = l.last_location_update "
+        "FROM drivers AS d2 LEFT JOIN driver_live_state AS l ON l.driver_id = d2.id "
+        "WHERE d.id = d2.id"
+    )
+    op.alter_column("drivers", "online_status", nullable=False)
+    op.create_index(
+        "ix_drivers_available",
+        "drivers",
+        ["driver_type"],
+        postgresql_where=sa.text("status = 'APPROVED' AND online_status = 'ONLINE'")
+    )
+
+    op.drop_index("ix_driver_live_state_online", table_name="driver_live_state")
+    op.drop_table("driver_live_state")
@@ -0,0 +1,127 @@
+"""Monthly partitions for rides and deliveries, and trip archive tables
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Rebuilds rides and deliveries as tables range-partitioned by month on
+created_at (the primary key becomes (id, created_at)), and adds the
+ride_archive and delivery_archive tables that finished trips are moved
+into. Partitions cover every month with data through three months ahead;
+the trip archiver keeps creating them from there.
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.utils.partitions import add_months, month_start, partition_name
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+# table -> (foreign keys as (column, referenced table), indexes as (name, columns, where))
+TRIP_TABLES = {
+    "rides": (
+        [("user_id", "users"), ("driver_id", "users"), ("assigned_driver_id", "drivers")],
+        [
+            ("ix_rides_id", ["id"], None),
+            ("ix_rides_user_id", ["user_id"], None),
+            ("ix_rides_driver_id", ["driver_id"], None),
+            ("ix_rides_assigned_driver_id", ["assigned_driver_id"], None),
+            ("ix_rides_status", ["status"], None),
+            (
+                "ix_rides_pending_offers",
+                ["assigned_driver_id", "driver_response_deadline"],
+                "status = 'PENDING'"
+            ),
+        ],
+    ),
+    "deliveries": (
+        [("user_id", "users"), ("driver_id", "users")],
+        [
+            ("ix_deliveries_id", ["id"], None),
+            ("ix_deliveries_user_id", ["user_id"], None),
+            ("ix_deliveries_driver_id", ["driver_id"], None),
+            ("ix_deliveries_status", ["status"], None),
+            ("ix_deliveries_user_created_at_id", ["user_id", "created_at", "id"], None),
+        ],
+    ),
+}
+
+ARCHIVE_TABLES = ("ride_archive", "delivery_archive")
+
+
+def _create_constraints(table: str, partitioned: bool) -> None:
+    foreign_keys, indexes = TRIP_TABLES[table]
+    op.create_primary_key(f"{table}_pkey", table, ["id", "created_at"] if partitioned else ["id"])
+    for column, referenced in foreign_keys:
+        op.create_foreign_key(f"{table}_{column}_fkey", table, referenced, [column], ["id"])
+    for name, columns, where in indexes:
+        op.create_index(name, table, columns, postgresql_where=sa.text(where) if where else None)
+
+
+def upgrade() -> None:
+    op.drop_constraint("ride_trajectories_ride_id_fkey", "ride_trajectories", type_="foreignkey")
+
+    bind = op.get_bind()
+    current = month_start(datetime.utcnow())
+    for table in TRIP_TABLES:
+        op.execute(f"UPDATE {table} SET created_at = updated_at WHERE created_at IS NULL")
+        oldest = bind.execute(sa.text(f"SELECT min(created_at) FROM {table}")).scalar()
+
+        op.rename_table(table, f"{table}_unpartitioned")
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+        month = month_start(oldest) if oldest and oldest < datetime.utcnow() else current
+        while month <= add_months(current, MONTHS_AHEAD):
+            op.execute(
+                f"CREATE TABLE {partition_name(table, month)} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+            )
+            month = add_months(month, 1)
+
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_unpartitioned")
+        op.drop_table(f"{table}_unpartitioned")
+        _create_constraints(table, partitioned=True)
+
+    for table in ARCHIVE_TABLES:
+        op.create_table(
+            table,
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("month", sa.Date(), nullable=False),
+            sa.Column("trip_count", sa.Integer(), nullable=False),
+            sa.Column("first_created_at", sa.DateTime(), nullable=False),
+            sa.Column("last_created_at", sa.DateTime(), nullable=False),
+            sa.Column("payload", sa.LargeBinary(), nullable=False),
+            sa.Column("archived_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index(f"ix_{table}_user_last_created_at", table, ["user_id", "last_created_at"])
+
+
+def downgrade() -> None:
+    # Archived trips are not moved back; archive them again after upgrading
+    for table in ARCHIVE_TABLES:
+        op.drop_index(f"ix_{table}_user_last_created_at", table_name=table)
+        op.drop_table(table)
+
+    for table in TRIP_TABLES:
+        op.rename_table(table, f"{table}_partitioned")
+        op.execute(f"CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS)")
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_partitioned")
+        # Drops the partitions with it
+        op.drop_table(f"{table}_partitioned")
+        _create_constraints(table, partitioned=False)
+
+    op.create_foreign_key("ride_trajectories_ride_id_fkey", "ride_trajectories", "rides", ["ride_id"], ["id"])
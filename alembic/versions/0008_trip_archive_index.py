@@ -0,0 +1,60 @@
+"""Trip archive index
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Adds ride_archive_trips and delivery_archive_trips, mapping every archived
+trip to the batch holding it, so a trip lookup decompresses one batch
+instead of all of the user's. Batches archived before this revision are
+unpacked once to fill them.
+"""
+import json
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# archive table -> index table
+INDEX_TABLES = {
+    "ride_archive": "ride_archive_trips",
+    "delivery_archive": "delivery_archive_trips",
+}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for archive, index in INDEX_TABLES.items():
+        table = op.create_table(
+            index,
+            sa.Column("trip_id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column(
+                "batch_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey(f"{archive}.id", ondelete="CASCADE"),
+                nullable=False
+            ),
+        )
+
+        batch_ids = bind.execute(sa.text(f"SELECT id FROM {archive}")).scalars().all()
+        for batch_id in batch_ids:
+            payload = bind.execute(
+                sa.text(f"SELECT payload FROM {archive} WHERE id = :id"), {"id": batch_id}
+            ).scalar()
+            data = json.loads(zlib.decompress(payload))
+            position = data["columns"].index("id")
+            op.bulk_insert(table, [{"trip_id": row[position], "batch_id": batch_id} for row in data["rows"]])
+
+
+def downgrade() -> None:
+    for index in INDEX_TABLES.values():
+        op.drop_table(index)
@@ -1,20 +1,30 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
+from uuid import UUID
 
-from app.database import get_db
+from app.database import AsyncSessionLocal, async_read_session, get_async_db, read_session
 from app.core.security import decode_access_token
-from app.models import User
+from app.core.principal_cache import driver_id_cache, principal_cache
+from app.core.read_routing import recent_writes
+from app.models import User, Driver
 
 security = HTTPBearer()
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token."""
+async def _load_principal(user_id: UUID) -> Optional[User]:
+    """Load a user in its own short-lived session and detach it for caching."""
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if user is not None:
+            db.expunge(user)
+        return user
+
+
+def _token_subject(credentials: HTTPAuthorizationCredentials) -> str:
+    """User ID (JWT sub) of a bearer token."""
     token = credentials.credentials
     payload = decode_access_token(token)
     
@@ -32,18 +42,162 @@ def get_current_user(
             detail="Invalid authentication credentials",
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    return user_id
+
+
+def _subject_uuid(user_id: str) -> UUID:
+    try:
+        return UUID(user_id)
+    except ValueError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
+            detail="Invalid authentication credentials",
         )
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> User:
+    """
+    Get current authenticated user from JWT token.
+    
+    Users are served from the principal cache when possible, so a cache hit
+    does not touch the database. The returned user is detached: reload it
+    through the request's own session before changing it.
+    """
+    user_id = _token_subject(credentials)
+    user = principal_cache.get(user_id)
+    if user is None:
+        user = await _load_principal(_subject_uuid(user_id))
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+        principal_cache.put(user_id, user)
     
     return user
 
 
-def get_current_active_user(
+async def get_principal_from_header(authorization: Optional[str]) -> Optional[User]:
+    """
+    User behind an Authorization header, or None without a valid token.
+    
+    For middleware, which runs outside dependency injection. Served from the
+    principal cache like get_current_user.
+    """
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    return await get_principal_from_token(authorization[7:])
+
+
+async def get_principal_from_token(token: Optional[str]) -> Optional[User]:
+    """
+    User behind a JWT, or None if the token is invalid or the user no longer exists.
+    
+    For WebSockets and middleware, which run outside the HTTP bearer
+    dependency. Served from the principal cache like get_current_user.
+    """
+    payload = decode_access_token(token) if token else None
+    user_id = payload.get("sub") if payload else None
+    if user_id is None:
+        return None
+    
+    user = principal_cache.get(user_id)
+    if user is None:
+        try:
+            user = await _load_principal(UUID(user_id))
+        except ValueError:
+            return None
+        if user is not None:
+            principal_cache.put(user_id, user)
+    return user
+
+
+async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
     """Get current active user."""
     return current_user
+
+
+async def get_current_driver(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> Driver:
+    """
+    Get the driver profile of the authenticated user in a single query.
+    
+    With the user cached only the driver row is read; otherwise user and
+    driver come back from one outer join and the user is cached. The driver
+    is attached to the request's session.
+    """
+    user_id = _token_subject(credentials)
+    user = principal_cache.get(user_id)
+    if user is not None:
+        result = await db.execute(select(Driver).where(Driver.user_id == user.id))
+        driver = result.scalars().first()
+    else:
+        result = await db.execute(
+            select(User, Driver).outerjoin(
+                Driver, Driver.user_id == User.id
+            ).where(User.id == _subject_uuid(user_id))
+        )
+        row = result.first()
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+        user, driver = row
+        db.expunge(user)
+        principal_cache.put(user_id, user)
+    
+    if driver is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Driver profile not found"
+        )
+    
+    driver_id_cache.put(user_id, driver.id)
+    return driver
+
+
+async def get_current_driver_id(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> UUID:
+    """Get the driver profile ID of the authenticated user, from cache when possible."""
+    driver_id = driver_id_cache.get(_token_subject(credentials))
+    if driver_id is None:
+        driver_id = (await get_current_driver(credentials, db)).id
+    return driver_id
+
+
+def get_read_db(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Database session for read-only endpoints.
+    
+    Reads go to a read replica, round-robin, except right after the same
+    user wrote something: then they go to the primary so the user sees it.
+    
+    Assumes a single process: recent writes are remembered per process, so
+    with several uvicorn workers or instances a read served by another
+    process than the write can still hit a lagging replica. Run one worker
+    per instance with sticky sessions, or leave DATABASE_REPLICA_URLS empty.
+    """
+    db = read_session(use_primary=recent_writes.recent(_token_subject(credentials)))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Async variant of get_read_db."""
+    async with async_read_session(use_primary=recent_writes.recent(_token_subject(credentials))) as db:
+        yield db
@@ -1,14 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 from app.database import get_db
-from app.schemas import DriverResponse
-from app.models import User, Driver, DriverStatus
-from app.api.deps import get_current_active_user
+from app.schemas import DriverResponse, DriverListItem
+from app.models import User, Driver, DriverStatus, DriverType, VehicleType, PricingRate
+from app.api.deps import get_current_active_user, get_read_db
+from app.core.driver_index import driver_index
+from app.core.driver_counts import driver_counts
+from app.core.surge import surge_monitor
+from app.core.principal_cache import invalidate_principal, principal_cache
+from app.core.password_pool import password_pool
+from app.core.dispatcher import ride_dispatcher
+from app.core.pricing import pricing_engine
+from app.core.profiling import ProfiledRoute, request_profiles
+from app.utils.pagination import decode_cursor, encode_cursor
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+
+class PricingRateUpdate(BaseModel):
+    driver_type: str  # taxi, delivery
+    vehicle_type: Optional[str] = None  # omit for the service-wide rate
+    base_fare: float = Field(0, ge=0)
+    per_km: float = Field(..., ge=0)
+    minimum_fare: float = Field(0, ge=0)
 
 
 def is_admin(current_user: User) -> bool:
@@ -16,61 +35,109 @@ def is_admin(current_user: User) -> bool:
     return current_user.role == "admin"
 
 
-@router.get("/drivers/pending", response_model=List[DriverResponse])
+def list_drivers(
+    db: Session,
+    response: Response,
+    driver_status: DriverStatus,
+    cursor: Optional[str],
+    limit: int,
+    include_total: bool
+):
+    """
+    One page of drivers with the given status, oldest first.
+    
+    Pages are keyed on (created_at, id), so every page costs the same index
+    range scan. Only the list columns are loaded. The cursor of the next
+    page goes in the X-Next-Cursor header (absent on the last page), and
+    X-Total-Count carries the cached total when include_total is set.
+    """
+    query = db.query(
+        Driver.id,
+        Driver.user_id,
+        Driver.driver_type,
+        Driver.name,
+        Driver.phone,
+        Driver.vehicle_type,
+        Driver.vehicle_number,
+        Driver.status,
+        Driver.created_at
+    ).filter(Driver.status == driver_status)
+    
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.filter(tuple_(Driver.created_at, Driver.id) > after)
+    
+    rows = query.order_by(Driver.created_at, Driver.id).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    if include_total:
+        response.headers["X-Total-Count"] = str(driver_counts.get(db, driver_status))
+    
+    return rows
+
+
+@router.get("/drivers/pending", response_model=List[DriverListItem])
 def get_pending_drivers(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    include_total: bool = False,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get all pending driver applications (Admin only)."""
+    """Get pending driver applications, one page at a time (Admin only)."""
     if not is_admin(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
     
-    pending_drivers = db.query(Driver).filter(
-        Driver.status == DriverStatus.PENDING
-    ).all()
-    
-    return pending_drivers
+    return list_drivers(db, response, DriverStatus.PENDING, cursor, limit, include_total)
 
 
-@router.get("/drivers/approved", response_model=List[DriverResponse])
+@router.get("/drivers/approved", response_model=List[DriverListItem])
 def get_approved_drivers(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    include_total: bool = False,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get all approved drivers (Admin only)."""
+    """Get approved drivers, one page at a time (Admin only)."""
     if not is_admin(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
     
-    approved_drivers = db.query(Driver).filter(
-        Driver.status == DriverStatus.APPROVED
-    ).all()
-    
-    return approved_drivers
+    return list_drivers(db, response, DriverStatus.APPROVED, cursor, limit, include_total)
 
 
-@router.get("/drivers/rejected", response_model=List[DriverResponse])
+@router.get("/drivers/rejected", response_model=List[DriverListItem])
 def get_rejected_drivers(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    include_total: bool = False,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get all rejected drivers (Admin only)."""
+    """Get rejected drivers, one page at a time (Admin only)."""
     if not is_admin(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
     
-    rejected_drivers = db.query(Driver).filter(
-        Driver.status == DriverStatus.REJECTED
-    ).all()
-    
-    return rejected_drivers
+    return list_drivers(db, response, DriverStatus.REJECTED, cursor, limit, include_total)
 
 
 @router.post("/drivers/{driver_id}/approve")
@@ -96,6 +163,12 @@ def approve_driver(
     driver.status = DriverStatus.APPROVED
     driver.rejection_reason = None
     db.commit()
+    driver_counts.invalidate()
+    
+    # A driver already online becomes matchable right away
+    if driver.live_state is not None:
+        driver_index.sync(driver, driver.live_state)
+        surge_monitor.sync(driver, driver.live_state)
     
     return {"message": "Driver approved successfully", "driver_id": driver_id}
 
@@ -130,6 +203,9 @@ def reject_driver(
     driver.status = DriverStatus.REJECTED
     driver.rejection_reason = reason
     db.commit()
+    driver_index.remove(driver.id)
+    surge_monitor.remove(driver.id)
+    driver_counts.invalidate()
     
     return {"message": "Driver rejected", "driver_id": driver_id, "reason": reason}
 
@@ -154,8 +230,13 @@ def delete_driver(
             detail="Driver not found"
         )
     
+    user_id = driver.user_id
+    driver_index.remove(driver.id)
+    surge_monitor.remove(driver.id)
     db.delete(driver)
     db.commit()
+    invalidate_principal(user_id)
+    driver_counts.invalidate()
     
     return {"message": "Driver deleted successfully", "driver_id": driver_id}
 
@@ -164,7 +245,7 @@ def delete_driver(
 def get_driver_details(
     driver_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get specific driver details (Admin only)."""
     if not is_admin(current_user):
@@ -181,3 +262,157 @@ def get_driver_details(
         )
     
     return driver
+
+
+@router.get("/dispatch/stats")
+def get_dispatch_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get batched ride dispatcher statistics (Admin only)."""
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return ride_dispatcher.stats()
+
+
+@router.get("/pricing")
+def get_pricing(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get active pricing rates and quote cache statistics (Admin only)."""
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return pricing_engine.stats()
+
+
+@router.put("/pricing/rates")
+def set_pricing_rate(
+    rate_data: PricingRateUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Create or update a pricing rate and apply it immediately (Admin only)."""
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    try:
+        driver_type = DriverType(rate_data.driver_type)
+        vehicle_type = VehicleType(rate_data.vehicle_type) if rate_data.vehicle_type else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid driver or vehicle type"
+        )
+    
+    query = db.query(PricingRate).filter(PricingRate.driver_type == driver_type)
+    if vehicle_type is None:
+        query = query.filter(PricingRate.vehicle_type.is_(None))
+    else:
+        query = query.filter(PricingRate.vehicle_type == vehicle_type)
+    
+    rate = query.first()
+    if not rate:
+        rate = PricingRate(driver_type=driver_type, vehicle_type=vehicle_type)
+        db.add(rate)
+    
+    rate.base_fare = rate_data.base_fare
+    rate.per_km = rate_data.per_km
+    rate.minimum_fare = rate_data.minimum_fare
+    db.commit()
+    
+    # Other workers pick the change up on their next periodic reload
+    pricing_engine.reload(db)
+    
+    return pricing_engine.stats()
+
+
+@router.get("/surge")
+def get_surge_zones(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get per-zone supply, recent demand and surge multipliers (Admin only)."""
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return surge_monitor.stats()
+
+
+@router.get("/principal-cache/stats")
+def get_principal_cache_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get authenticated user cache hit/miss counters (Admin only)."""
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return principal_cache.stats()
+
+
+@router.get("/password-pool/stats")
+def get_password_pool_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get password hashing queue depth, rejections and login latency (Admin only)."""
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return password_pool.stats()
+
+
+@router.get("/profiles")
+def get_request_profiles(
+    current_user: User = Depends(get_current_active_user)
+):
+    """List stored request profiles: on-demand ones and the slowest sampled per route (Admin only)."""
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return request_profiles.stats()
+
+
+@router.get("/profiles/{profile_id}")
+def get_request_profile(
+    profile_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Download a request profile in speedscope (flamegraph) format (Admin only)."""
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    profile = request_profiles.get(profile_id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    return Response(
+        content=profile.speedscope(),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{profile.id}.speedscope.json"'}
+    )
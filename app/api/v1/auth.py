@@ -1,19 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import time
 
 from app.database import get_db
 from app.schemas import UserCreate, UserLogin, Token, UserResponse
 from app.models import User
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import create_access_token
+from app.core.password_pool import password_pool
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Password hashing runs in the password pool; these endpoints are async so a
+# request waiting for it holds neither a threadpool thread nor the GIL.
+
+
+def _save(db: Session, instance) -> None:
+    db.add(instance)
+    db.commit()
+    db.refresh(instance)
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user."""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.phone == user_data.phone).first()
+    existing_user = await run_in_threadpool(
+        lambda: db.query(User.id).filter(User.phone == user_data.phone).first()
+    )
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -21,7 +36,7 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_pool.hash(user_data.password)
     new_user = User(
         phone=user_data.phone,
         name=user_data.name,
@@ -29,32 +44,42 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         password_hash=hashed_password
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(_save, db, new_user)
     
     return new_user
 
 
 @router.post("/login", response_model=Token)
-def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     """Login and get access token."""
-    # Find user by national_id
-    user = db.query(User).filter(User.national_id == credentials.national_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect national ID or password"
-        )
-    
-    # Verify password
-    if not verify_password(credentials.password, user.password_hash):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect phone or password"
+    started = time.perf_counter()
+    try:
+        # Find user by national_id
+        user = await run_in_threadpool(
+            lambda: db.query(User).filter(User.national_id == credentials.national_id).first()
         )
-    
-    # Create access token
-    access_token = create_access_token(data={"sub": str(user.id), "role": user.role})
-    
-    return {"access_token": access_token, "token_type": "bearer"}
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect national ID or password"
+            )
+        
+        # Verify password
+        verified, new_hash = await password_pool.verify_and_update(credentials.password, user.password_hash)
+        if not verified:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect phone or password"
+            )
+        
+        # Create access token
+        access_token = create_access_token(data={"sub": str(user.id), "role": user.role})
+        
+        # Hashing parameters changed since this password was stored
+        if new_hash:
+            user.password_hash = new_hash
+            await run_in_threadpool(db.commit)
+        
+        return {"access_token": access_token, "token_type": "bearer"}
+    finally:
+        password_pool.record_login(time.perf_counter() - started)
@@ -1,36 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import exists, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from uuid import UUID
 
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas import DeliveryCreate, DeliveryResponse, DeliveryStatusUpdate
-from app.models import User, Delivery, DeliveryStatus
-from app.api.deps import get_current_active_user
-from app.utils.location import calculate_distance
-from app.core.pricing import calculate_delivery_price
+from app.models import User, Delivery, DeliveryArchive, DeliveryStatus, DriverType
+from app.api.deps import get_async_read_db, get_current_active_user
+from app.core.archive import archive_horizon, archived_history, find_archived_trip
+from app.core.pricing import calculate_delivery_price, pricing_engine
+from app.core.surge import surge_monitor
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.post("", response_model=DeliveryResponse, status_code=status.HTTP_201_CREATED)
-def create_delivery(
+async def create_delivery(
     delivery_data: DeliveryCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new delivery request."""
-    # Calculate distance
-    distance_km = calculate_distance(
+    # Calculate distance and pricing
+    quote = pricing_engine.quote(
+        DriverType.DELIVERY,
         delivery_data.pickup_lat,
         delivery_data.pickup_lng,
         delivery_data.delivery_lat,
         delivery_data.delivery_lng
     )
-    
-    # Calculate pricing
+    surge_multiplier = surge_monitor.record_request(DriverType.DELIVERY, delivery_data.pickup_lat, delivery_data.pickup_lng)
     pricing = calculate_delivery_price(
-        distance_km,
+        round(quote.price * surge_multiplier),
         delivery_data.driver_pays,
         delivery_data.product_amount
     )
@@ -53,26 +57,28 @@ def create_delivery(
         receiver_national_id=delivery_data.receiver_national_id,
         driver_pays=delivery_data.driver_pays,
         product_amount=delivery_data.product_amount,
-        distance_km=distance_km,
+        distance_km=quote.distance_km,
         delivery_fee=pricing["delivery_fee"],
-        total_cost=pricing["total_cost"]
+        total_cost=pricing["total_cost"],
+        surge_multiplier=surge_multiplier
     )
     
     db.add(new_delivery)
-    db.commit()
-    db.refresh(new_delivery)
+    await db.commit()
     
     return new_delivery
 
 
 @router.get("/{delivery_id}", response_model=DeliveryResponse)
-def get_delivery(
+async def get_delivery(
     delivery_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get delivery details."""
-    delivery = db.query(Delivery).filter(Delivery.id == delivery_id).first()
+    delivery = await db.get(Delivery, delivery_id)
+    if not delivery:
+        delivery = await find_archived_trip(db, Delivery, current_user.id, delivery_id)
     
     if not delivery:
         raise HTTPException(
@@ -91,29 +97,81 @@ def get_delivery(
 
 
 @router.get("", response_model=List[DeliveryResponse])
-def get_user_deliveries(
+async def get_user_deliveries(
+    response: Response,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
-    skip: int = 0,
+    db: AsyncSession = Depends(get_async_read_db),
+    cursor: Optional[str] = None,
+    skip: int = Query(
+        0,
+        ge=0,
+        deprecated=True,
+        description="Offset for older clients. Only pages through deliveries not yet archived; "
+                    "a page reaching past them is rejected with 400, use cursor instead."
+    ),
     limit: int = 20
 ):
-    """Get user's delivery history."""
-    deliveries = db.query(Delivery).filter(
-        Delivery.user_id == current_user.id
-    ).order_by(Delivery.created_at.desc()).offset(skip).limit(limit).all()
+    """
+    Get user's delivery history, newest first.
+    
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one;
+    every page is the same index range scan. `skip` is still accepted for
+    older clients but costs more the deeper the page, and cannot reach
+    archived deliveries.
+    """
+    # Whether the user has archived deliveries comes along with the page, so
+    # the many users without any never pay for an archive query
+    has_archive = exists().where(DeliveryArchive.user_id == current_user.id)
+    query = select(Delivery, has_archive.label("has_archive")).where(Delivery.user_id == current_user.id)
+    before = None
+    
+    if cursor:
+        try:
+            before = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.where(tuple_(Delivery.created_at, Delivery.id) < before)
+    elif skip:
+        query = query.offset(skip)
+    
+    result = await db.execute(
+        query.order_by(Delivery.created_at.desc(), Delivery.id.desc()).limit(limit + 1)
+    )
+    rows = result.all()
+    deliveries = [row.Delivery for row in rows]
+    archived = rows[0].has_archive if rows else await db.scalar(select(has_archive))
+    
+    # Archived deliveries are all older than the archive horizon: merge them
+    # in once the page reaches back that far
+    reaches_archive = archived and (len(deliveries) <= limit or deliveries[-1].created_at < archive_horizon())
+    if reaches_archive and skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="skip cannot page into archived deliveries, use cursor"
+        )
+    if reaches_archive:
+        deliveries += await archived_history(db, Delivery, current_user.id, before, limit + 1)
+        deliveries.sort(key=lambda delivery: (delivery.created_at, delivery.id), reverse=True)
+    
+    if len(deliveries) > limit:
+        deliveries = deliveries[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(deliveries[-1].created_at, deliveries[-1].id)
     
     return deliveries
 
 
 @router.patch("/{delivery_id}/status", response_model=DeliveryResponse)
-def update_delivery_status(
+async def update_delivery_status(
     delivery_id: UUID,
     status_update: DeliveryStatusUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update delivery status."""
-    delivery = db.query(Delivery).filter(Delivery.id == delivery_id).first()
+    delivery = await db.get(Delivery, delivery_id)
     
     if not delivery:
         raise HTTPException(
@@ -131,7 +189,6 @@ def update_delivery_status(
     # Update status
     delivery.status = DeliveryStatus(status_update.status)
     
-    db.commit()
-    db.refresh(delivery)
+    await db.commit()
     
     return delivery
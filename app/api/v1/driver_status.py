@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, status, WebSocket
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
 from typing import Optional
+from uuid import UUID
+import asyncio
 
-from app.database import get_db
-from app.models import Driver, DriverOnlineStatus
-from app.api.deps import get_current_active_user
-from app.models.user import User
+from app.config import settings
+from app.database import AsyncSessionLocal, get_async_db
+from app.models import Driver, DriverLiveState, DriverOnlineStatus, Ride, RideStatus
+from app.api.deps import get_current_driver_id, get_principal_from_token
+from app.schemas import RideResponse
+from app.core.driver_index import driver_index
+from app.core.surge import surge_monitor
+from app.core.location_buffer import location_buffer
+from app.core.metrics import LOCATION_UPDATES
+from app.core.realtime import DriverConnection, driver_hub
+from app.core.trajectory import trajectory_store
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 class DriverStatusUpdate(BaseModel):
@@ -23,21 +34,27 @@ class LocationUpdate(BaseModel):
     longitude: float
 
 
+def apply_location(driver_id: UUID, latitude: float, longitude: float) -> None:
+    """Record a location ping in memory; the buffer writes it to the database later."""
+    location_buffer.record(driver_id, latitude, longitude)
+    driver_index.move(driver_id, latitude, longitude)
+    surge_monitor.move(driver_id, latitude, longitude)
+    trajectory_store.record(driver_id, latitude, longitude)
+    LOCATION_UPDATES.inc()
+
+
 @router.post("/status")
-def update_driver_status(
+async def update_driver_status(
     status_data: DriverStatusUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    driver_id: UUID = Depends(get_current_driver_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Update driver online status and optionally location."""
-    # Get driver profile
-    driver = db.query(Driver).filter(Driver.user_id == current_user.id).first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver profile not found"
-        )
+    """
+    Update driver online status and optionally location.
     
+    Only the driver's live state is written. The profile's type and approval,
+    which decide matching eligibility, are read by the same statement.
+    """
     # Validate status
     try:
         new_status = DriverOnlineStatus(status_data.status)
@@ -48,75 +65,214 @@ def update_driver_status(
         )
     
     # Update status
-    driver.online_status = new_status
+    values = {"online_status": new_status}
     
-    # Update location if provided
+    # Update location if provided, otherwise persist any buffered ping with this write
+    buffered = location_buffer.get(driver_id)
+    buffered_at = buffered.recorded_at if buffered is not None else None
     if status_data.latitude is not None and status_data.longitude is not None:
-        driver.current_location_lat = status_data.latitude
-        driver.current_location_lng = status_data.longitude
-        driver.last_location_update = datetime.utcnow()
+        values["current_location_lat"] = status_data.latitude
+        values["current_location_lng"] = status_data.longitude
+        values["last_location_update"] = datetime.utcnow()
+        trajectory_store.record(driver_id, status_data.latitude, status_data.longitude)
+    elif buffered is not None:
+        values["current_location_lat"] = buffered.lat
+        values["current_location_lng"] = buffered.lng
+        values["last_location_update"] = buffered.recorded_at
+    
+    # Core UPDATE ... FROM drivers: ORM updates cannot return the joined columns
+    result = await db.execute(
+        update(DriverLiveState.__table__).where(
+            DriverLiveState.driver_id == driver_id,
+            Driver.id == DriverLiveState.driver_id
+        ).values(**values).returning(
+            Driver.id,
+            Driver.user_id,
+            Driver.status,
+            Driver.driver_type,
+            DriverLiveState.online_status,
+            DriverLiveState.current_location_lat,
+            DriverLiveState.current_location_lng
+        )
+    )
+    state = result.first()
+    if state is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Driver profile not found"
+        )
+    await db.commit()
     
-    db.commit()
-    db.refresh(driver)
+    # The buffered point is superseded only once the write is committed
+    if buffered_at is not None:
+        location_buffer.discard(driver_id, up_to=buffered_at)
+    
+    # The row carries both the profile and the live state fields
+    driver_index.sync(state, state)
+    surge_monitor.sync(state, state)
     
     return {
         "message": "Status updated successfully",
-        "status": driver.online_status.value,
+        "status": state.online_status.value,
         "location": {
-            "lat": driver.current_location_lat,
-            "lng": driver.current_location_lng
-        } if driver.current_location_lat else None
+            "lat": state.current_location_lat,
+            "lng": state.current_location_lng
+        } if state.current_location_lat else None
     }
 
 
 @router.post("/location")
-def update_driver_location(
+async def update_driver_location(
     location: LocationUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    driver_id: UUID = Depends(get_current_driver_id)
 ):
     """Update driver location (called periodically when online)."""
-    driver = db.query(Driver).filter(Driver.user_id == current_user.id).first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver profile not found"
-        )
-    
-    driver.current_location_lat = location.latitude
-    driver.current_location_lng = location.longitude
-    driver.last_location_update = datetime.utcnow()
-    
-    db.commit()
+    # No row is read here; the point is written to the database by the location buffer
+    apply_location(driver_id, location.latitude, location.longitude)
     
     return {
         "message": "Location updated",
         "location": {
-            "lat": driver.current_location_lat,
-            "lng": driver.current_location_lng
+            "lat": location.latitude,
+            "lng": location.longitude
         }
     }
 
 
 @router.get("/me/status")
-def get_driver_status(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+async def get_driver_status(
+    driver_id: UUID = Depends(get_current_driver_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current driver status and pending ride requests."""
-    driver = db.query(Driver).filter(Driver.user_id == current_user.id).first()
-    if not driver:
+    live = await db.get(DriverLiveState, driver_id)
+    if live is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Driver profile not found"
         )
     
+    # Prefer the latest buffered ping over the last flushed row values
+    lat = live.current_location_lat
+    lng = live.current_location_lng
+    last_update = live.last_location_update
+    buffered = location_buffer.get(driver_id)
+    if buffered is not None:
+        lat, lng, last_update = buffered.lat, buffered.lng, buffered.recorded_at
+    
     return {
-        "status": driver.online_status.value,
+        "status": live.online_status.value,
         "location": {
-            "lat": driver.current_location_lat,
-            "lng": driver.current_location_lng,
-            "last_update": driver.last_location_update.isoformat() if driver.last_location_update else None
+            "lat": lat,
+            "lng": lng,
+            "last_update": last_update.isoformat() if last_update else None
         },
         "pending_rides": []  # Will implement ride matching next
     }
+
+
+async def _load_socket_driver(user_id: UUID):
+    """Resolve the driver behind a socket and its outstanding offers."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Driver.id, Driver.user_id).where(Driver.user_id == user_id))
+        driver = result.first()
+        if not driver:
+            return None, []
+        
+        result = await db.execute(
+            select(Ride).where(
+                Ride.assigned_driver_id == driver.id,
+                Ride.status == RideStatus.PENDING,
+                Ride.driver_response_deadline > datetime.utcnow()
+            )
+        )
+        pending_rides = result.scalars().all()
+        
+        return driver, [RideResponse.model_validate(ride).model_dump(mode="json") for ride in pending_rides]
+
+
+@router.websocket("/ws")
+async def driver_socket(websocket: WebSocket, token: Optional[str] = None):
+    """
+    Realtime channel for drivers.
+    
+    Authenticates once per connection with the JWT (`?token=` or a Bearer
+    Authorization header). The driver streams `{"type": "location",
+    "latitude": .., "longitude": ..}` frames and receives `ride_offer` /
+    `offer_withdrawn` messages as soon as rides are assigned. The server
+    pings every DRIVER_WS_HEARTBEAT_SECONDS and drops silent sockets.
+    """
+    if token is None:
+        authorization = websocket.headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[7:]
+    
+    # Same principal resolution as the HTTP endpoints: deleted users are refused
+    user = await get_principal_from_token(token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid authentication credentials")
+        return
+    
+    driver, pending_rides = await _load_socket_driver(user.id)
+    if driver is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Driver profile not found")
+        return
+    
+    await websocket.accept()
+    connection = DriverConnection(websocket, driver.id, driver.user_id)
+    driver_hub.register(connection)
+    connection.send({"type": "hello", "pending_rides": pending_rides})
+    
+    loop = asyncio.get_running_loop()
+    last_seen = loop.time()
+    
+    async def receive_frames():
+        nonlocal last_seen
+        while True:
+            frame = await websocket.receive_json()
+            last_seen = loop.time()
+            kind = frame.get("type") if isinstance(frame, dict) else None
+            
+            if kind == "location":
+                try:
+                    location = LocationUpdate(**frame)
+                except ValidationError:
+                    connection.send({"type": "error", "detail": "Invalid location frame"})
+                    continue
+                apply_location(driver.id, location.latitude, location.longitude)
+            elif kind == "ping":
+                connection.send({"type": "pong"})
+            elif kind != "pong":
+                connection.send({"type": "error", "detail": "Unknown frame type"})
+    
+    async def send_messages():
+        while True:
+            message = await connection.outbox.get()
+            await websocket.send_json(message)
+    
+    async def heartbeat():
+        interval = settings.DRIVER_WS_HEARTBEAT_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            if loop.time() - last_seen > 2 * interval:
+                return
+            connection.send({"type": "ping"})
+    
+    tasks = [
+        asyncio.create_task(receive_frames()),
+        asyncio.create_task(send_messages()),
+        asyncio.create_task(heartbeat()),
+        asyncio.create_task(connection.closed.wait()),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        driver_hub.unregister(connection)
+        connection.closed.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
@@ -8,10 +8,13 @@ from pathlib import Path
 
 from app.database import get_db
 from app.schemas import DriverRegister, DriverResponse, DriverStatusResponse
-from app.models import User, Driver, DriverType, DriverStatus, VehicleType
-from app.api.deps import get_current_active_user
+from app.models import User, Driver, DriverLiveState, DriverType, DriverStatus, VehicleType
+from app.api.deps import get_current_active_user, get_current_driver
+from app.core.driver_counts import driver_counts
+from app.core.principal_cache import invalidate_principal
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 # Upload directory
 UPLOAD_DIR = Path("uploads/drivers")
@@ -124,29 +127,24 @@ def register_driver(
         vehicle_model=driver_data.vehicle_model,
         vehicle_number=driver_data.vehicle_number,
         vehicle_photo=driver_data.vehicle_photo,
+        live_state=DriverLiveState(),
     )
     
     db.add(new_driver)
     db.commit()
     db.refresh(new_driver)
+    # A re-registration replaces the driver id cached for this user
+    invalidate_principal(current_user.id)
+    driver_counts.invalidate()
     
     return new_driver
 
 
 @router.get("/me", response_model=DriverResponse)
-def get_driver_profile(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+async def get_driver_profile(
+    driver: Driver = Depends(get_current_driver)
 ):
     """Get current driver profile."""
-    driver = db.query(Driver).filter(Driver.user_id == current_user.id).first()
-    
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver profile not found"
-        )
-    
     return driver
 
 
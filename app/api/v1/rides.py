@@ -1,17 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import exists, func, select, true, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime, timedelta
-import math
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime
+from uuid import UUID
 
-from app.database import get_db
-from app.models import Ride, RideStatus, Driver, DriverOnlineStatus, DriverType
+from app.database import AsyncSessionLocal, get_async_db
+from app.models import Ride, RideStatus, Driver, DriverLiveState, DriverOnlineStatus, DriverType
 from app.models.user import User
-from app.api.deps import get_current_active_user
+from app.api.deps import get_async_read_db, get_current_active_user, get_current_driver
+from app.core.archive import find_archived_trip
 from app.schemas import RideResponse
+from app.core.driver_index import driver_index
+from app.core.dispatcher import ride_dispatcher
+from app.core.matching import (
+    offer_ride, build_offer, announce_offer, cancel_offer_expiry, prepare_reassignment, finish_reassignment
+)
+from app.core.ride_events import ride_events
+from app.core.location_buffer import location_buffer
+from app.core.metrics import RIDES_MATCHED, RIDES_REQUESTED, TIME_TO_MATCH
+from app.core.trajectory import trajectory_store
+from app.core.pricing import pricing_engine
+from app.core.surge import surge_monitor
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# What happened to a rejected ride (Reassignment.outcome)
+REJECT_MESSAGES = {
+    "reassigned": "Ride reassigned to next driver",
+    "requeued": "Ride returned to the dispatch queue",
+    "cancelled": "No drivers available, ride cancelled",
+}
 
 
 class RideRequestCreate(BaseModel):
@@ -28,251 +50,262 @@ class RideAcceptReject(BaseModel):
     action: str  # "accept" or "reject"
 
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points in kilometers using Haversine formula."""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-    
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
+def driver_location(driver_id: UUID, live) -> tuple:
+    """Latest known driver location, preferring a ping not yet written to the database."""
+    buffered = location_buffer.get(driver_id)
+    if buffered is not None:
+        return buffered.lat, buffered.lng
+    return live.current_location_lat, live.current_location_lng
+
+
+async def _move_ride(
+    db: AsyncSession,
+    ride_id: UUID,
+    driver: Driver,
+    from_statuses: Iterable[RideStatus],
+    values: Dict[str, Any],
+    driver_status: Optional[DriverOnlineStatus] = None
+) -> Optional[Row]:
+    """
+    Apply a ride transition in a single conditional UPDATE ... RETURNING.
+    
+    The ride only changes if it is still assigned to the driver and in one of
+    `from_statuses`, so of two racing requests exactly one wins. With
+    `driver_status`, the driver's live state changes in the same statement
+    (a data-modifying CTE), and only if the ride did. The driver profile row
+    is never written.
+    
+    Returns:
+        The ride's id, created_at and final_price with the driver's live state
+        (online_status and location), or None if nothing was changed
+    """
+    # updated_at is set explicitly: onupdate defaults do not fire inside a CTE
+    moved = update(Ride).where(
+        Ride.id == ride_id,
+        Ride.assigned_driver_id == driver.id,
+        Ride.status.in_(from_statuses)
+    ).values(updated_at=datetime.utcnow(), **values).returning(
+        Ride.id, Ride.created_at, Ride.final_price
+    ).cte("moved_ride")
     
-    return R * c
+    if driver_status is None:
+        live = select(DriverLiveState).where(DriverLiveState.driver_id == driver.id).subquery()
+    else:
+        live = update(DriverLiveState).where(
+            DriverLiveState.driver_id == driver.id,
+            exists(select(moved.c.id))
+        ).values(online_status=driver_status).returning(
+            DriverLiveState.online_status,
+            DriverLiveState.current_location_lat,
+            DriverLiveState.current_location_lng
+        ).cte("moved_live")
+    
+    result = await db.execute(
+        select(
+            moved.c.id,
+            moved.c.created_at,
+            moved.c.final_price,
+            live.c.online_status,
+            live.c.current_location_lat,
+            live.c.current_location_lng
+        ).select_from(moved).outerjoin(live, true())
+    )
+    return result.first()
 
 
-def calculate_price(distance_km: float) -> float:
-    """Calculate ride price based on distance."""
-    base_price = 5000  # 5000 SYP base fare
-    price_per_km = 2000  # 2000 SYP per km
-    return base_price + (distance_km * price_per_km)
+async def _transition_error(
+    db: AsyncSession,
+    ride_id: UUID,
+    driver: Driver,
+    conflict_detail: str,
+    hide_foreign: bool = False
+) -> HTTPException:
+    """
+    Explain why _move_ride changed nothing (only runs on that failure path).
+    
+    Args:
+        conflict_detail: Message for a ride assigned to the driver but in the wrong state
+        hide_foreign: Report rides of other drivers as not found instead of forbidden
+    """
+    result = await db.execute(select(Ride.assigned_driver_id).where(Ride.id == ride_id))
+    row = result.first()
+    if row is None or (hide_foreign and row.assigned_driver_id != driver.id):
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ride not found"
+        )
+    if row.assigned_driver_id != driver.id:
+        return HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This ride is not assigned to you"
+        )
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=conflict_detail
+    )
 
 
 @router.post("/request", response_model=RideResponse)
-def request_ride(
+async def request_ride(
     ride_request: RideRequestCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """User requests a new ride."""
     
     # Calculate distance and price
-    distance_km = calculate_distance(
+    quote = pricing_engine.quote(
+        DriverType.TAXI,
         ride_request.pickup_lat,
         ride_request.pickup_lng,
         ride_request.destination_lat,
         ride_request.destination_lng
     )
-    estimated_price = calculate_price(distance_km)
+    surge_multiplier = surge_monitor.record_request(DriverType.TAXI, ride_request.pickup_lat, ride_request.pickup_lng)
     
-    # Find nearest online driver
-    online_drivers = db.query(Driver).filter(
-        Driver.status == "approved",
-        Driver.online_status == DriverOnlineStatus.ONLINE,
-        Driver.driver_type == DriverType.TAXI,
-        Driver.current_location_lat.isnot(None),
-        Driver.current_location_lng.isnot(None)
-    ).all()
-    
-    if not online_drivers:
+    if len(driver_index) == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No drivers available at the moment"
         )
     
-    # Calculate distances and sort
-    driver_distances = []
-    for driver in online_drivers:
-        dist = calculate_distance(
-            ride_request.pickup_lat,
-            ride_request.pickup_lng,
-            driver.current_location_lat,
-            driver.current_location_lng
-        )
-        driver_distances.append((driver, dist))
-    
-    # Sort by distance
-    driver_distances.sort(key=lambda x: x[1])
-    nearest_driver = driver_distances[0][0]
-    
     # Create ride
     new_ride = Ride(
         user_id=current_user.id,
-        driver_id=nearest_driver.user_id,
-        assigned_driver_id=nearest_driver.id,
         pickup_lat=ride_request.pickup_lat,
         pickup_lng=ride_request.pickup_lng,
         pickup_address=ride_request.pickup_address,
         destination_lat=ride_request.destination_lat,
         destination_lng=ride_request.destination_lng,
         destination_address=ride_request.destination_address,
-        distance_km=distance_km,
-        estimated_price=estimated_price,
-        status=RideStatus.PENDING,
-        driver_response_deadline=datetime.utcnow() + timedelta(seconds=30)
+        distance_km=quote.distance_km,
+        estimated_price=round(quote.price * surge_multiplier),
+        surge_multiplier=surge_multiplier,
+        status=RideStatus.PENDING
     )
     
+    if ride_dispatcher.enabled:
+        # Driver is picked by the next batched dispatch tick
+        db.add(new_ride)
+        await db.commit()
+        RIDES_REQUESTED.inc()
+        ride_dispatcher.submit(new_ride.id, new_ride.pickup_lat, new_ride.pickup_lng)
+        return new_ride
+    
+    # Find nearest online driver
+    candidates = driver_index.nearest(ride_request.pickup_lat, ride_request.pickup_lng, k=1)
+    
+    if not candidates:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No drivers available at the moment"
+        )
+    
+    offer_ride(new_ride, candidates[0][0])
+    
     db.add(new_ride)
-    db.commit()
-    db.refresh(new_ride)
+    await db.commit()
+    RIDES_REQUESTED.inc()
+    announce_offer(build_offer(new_ride))
     
     return new_ride
 
 
 @router.get("/pending", response_model=List[RideResponse])
-def get_pending_rides(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+async def get_pending_rides(
+    driver: Driver = Depends(get_current_driver),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Driver gets pending ride requests assigned to them."""
     
-    # Get driver profile
-    driver = db.query(Driver).filter(Driver.user_id == current_user.id).first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver profile not found"
-        )
-    
     # Get pending rides assigned to this driver
-    pending_rides = db.query(Ride).filter(
-        Ride.assigned_driver_id == driver.id,
-        Ride.status == RideStatus.PENDING,
-        Ride.driver_response_deadline > datetime.utcnow()
-    ).all()
+    result = await db.execute(
+        select(Ride).where(
+            Ride.assigned_driver_id == driver.id,
+            Ride.status == RideStatus.PENDING,
+            Ride.driver_response_deadline > datetime.utcnow()
+        )
+    )
     
-    return pending_rides
+    return result.scalars().all()
 
 
 @router.post("/{ride_id}/accept")
-def accept_ride(
-    ride_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+async def accept_ride(
+    ride_id: UUID,
+    driver: Driver = Depends(get_current_driver),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Driver accepts a ride request."""
     
-    # Get driver profile
-    driver = db.query(Driver).filter(Driver.user_id == current_user.id).first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver profile not found"
-        )
-    
-    # Get ride
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
-    if not ride:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Ride not found"
-        )
-    
-    # Verify ride is assigned to this driver
-    if str(ride.assigned_driver_id) != str(driver.id):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="This ride is not assigned to you"
-        )
-    
-    # Check if still pending
-    if ride.status != RideStatus.PENDING:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Ride is no longer pending"
-        )
-    
-    # Accept ride
-    ride.status = RideStatus.MATCHED
-    driver.online_status = DriverOnlineStatus.IN_RIDE
-    
-    db.commit()
+    # Accept ride and take the driver off the market in one statement
+    moved = await _move_ride(
+        db, ride_id, driver, [RideStatus.PENDING],
+        {"status": RideStatus.MATCHED},
+        driver_status=DriverOnlineStatus.IN_RIDE
+    )
+    if moved is None:
+        raise await _transition_error(db, ride_id, driver, "Ride is no longer pending")
+    await db.commit()
+    
+    driver_index.remove(driver.id)
+    surge_monitor.remove(driver.id)
+    ride_dispatcher.release_driver(driver.id)
+    cancel_offer_expiry(ride_id)
+    ride_events.publish(ride_id)
+    RIDES_MATCHED.inc()
+    TIME_TO_MATCH.observe((datetime.utcnow() - moved.created_at).total_seconds())
     
     return {"message": "Ride accepted successfully", "ride_id": ride_id}
 
 
 @router.post("/{ride_id}/reject")
-def reject_ride(
-    ride_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+async def reject_ride(
+    ride_id: UUID,
+    driver: Driver = Depends(get_current_driver),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Driver rejects a ride request."""
-    
-    # Get driver profile
-    driver = db.query(Driver).filter(Driver.user_id == current_user.id).first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver profile not found"
-        )
-    
-    # Get ride
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
-    if not ride:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Ride not found"
-        )
-    
-    # Verify ride is assigned to this driver
-    if str(ride.assigned_driver_id) != str(driver.id):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="This ride is not assigned to you"
-        )
-    
-    # Find next nearest driver
-    online_drivers = db.query(Driver).filter(
-        Driver.id != driver.id,
-        Driver.status == "approved",
-        Driver.online_status == DriverOnlineStatus.ONLINE,
-        Driver.driver_type == DriverType.TAXI,
-        Driver.current_location_lat.isnot(None),
-        Driver.current_location_lng.isnot(None)
-    ).all()
-    
-    if online_drivers:
-        # Calculate distances and find nearest
-        driver_distances = []
-        for next_driver in online_drivers:
-            dist = calculate_distance(
-                ride.pickup_lat,
-                ride.pickup_lng,
-                next_driver.current_location_lat,
-                next_driver.current_location_lng
-            )
-            driver_distances.append((next_driver, dist))
-        
-        driver_distances.sort(key=lambda x: x[1])
-        nearest_driver = driver_distances[0][0]
-        
-        # Reassign to next driver
-        ride.assigned_driver_id = nearest_driver.id
-        ride.driver_id = nearest_driver.user_id
-        ride.driver_response_deadline = datetime.utcnow() + timedelta(seconds=30)
-        db.commit()
-        
-        return {"message": "Ride reassigned to next driver"}
-    else:
-        # No drivers available, cancel ride
-        ride.status = RideStatus.CANCELLED
-        db.commit()
-        
-        return {"message": "No drivers available, ride cancelled"}
+    """
+    Driver rejects a ride request.
+    
+    The next driver is picked from the ride's pickup point, so the ride is
+    read first; the write is conditional like the other transitions, and a
+    concurrent expiry or second reject makes it change nothing.
+    """
+    
+    ride = await db.get(Ride, ride_id)
+    if not ride or ride.assigned_driver_id != driver.id or ride.status != RideStatus.PENDING:
+        raise await _transition_error(db, ride_id, driver, "Ride is no longer pending")
+    db.expunge(ride)
+    
+    # Offer to the next driver (directly or through the dispatcher), or cancel if nobody is available
+    reassignment = prepare_reassignment(ride, driver.id)
+    moved = await _move_ride(db, ride_id, driver, [RideStatus.PENDING], {
+        "status": ride.status,
+        "assigned_driver_id": ride.assigned_driver_id,
+        "driver_id": ride.driver_id,
+        "driver_response_deadline": ride.driver_response_deadline
+    })
+    if moved is None:
+        raise await _transition_error(db, ride_id, driver, "Ride is no longer pending")
+    await db.commit()
+    
+    ride_dispatcher.release_driver(driver.id)
+    finish_reassignment(reassignment)
+    return {"message": REJECT_MESSAGES[reassignment.outcome], "outcome": reassignment.outcome}
 
 
 @router.get("/{ride_id}/status", response_model=RideResponse)
-def get_ride_status(
-    ride_id: str,
+async def get_ride_status(
+    ride_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """User polls for ride status updates."""
     
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
+    ride = await db.get(Ride, ride_id)
+    if not ride:
+        ride = await find_archived_trip(db, Ride, current_user.id, ride_id)
     if not ride:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -289,60 +322,133 @@ def get_ride_status(
     return ride
 
 
+TERMINAL_RIDE_STATUSES = {RideStatus.COMPLETED, RideStatus.CANCELLED}
+
+
+async def _load_rider_ride(ride_id: UUID, user_id: UUID) -> RideResponse:
+    """
+    Snapshot a ride owned by the rider using a short-lived session.
+    
+    Always reads the primary: a lagging replica could report "unchanged"
+    after the change was already published, leaving the poll to time out.
+    """
+    async with AsyncSessionLocal() as db:
+        ride = await db.get(Ride, ride_id)
+        if not ride:
+            ride = await find_archived_trip(db, Ride, user_id, ride_id)
+        if not ride:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Ride not found"
+            )
+        if str(ride.user_id) != str(user_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+        return RideResponse.model_validate(ride)
+
+
+@router.get("/{ride_id}/status/wait", response_model=RideResponse)
+async def wait_ride_status(
+    ride_id: UUID,
+    known_status: Optional[RideStatus] = Query(None, alias="status"),
+    known_driver_id: Optional[UUID] = Query(None, alias="driver_id"),
+    timeout: float = Query(25, gt=0, le=60),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Long-poll for ride status updates.
+    
+    Pass the status and driver_id the app last saw; the response comes back
+    as soon as either changes, or with the current ride after `timeout`
+    seconds. No database connection is held while waiting.
+    """
+    user_id = current_user.id
+    
+    # Subscribe before reading so a change in between is not missed
+    event = ride_events.subscribe(ride_id)
+    try:
+        ride = await _load_rider_ride(ride_id, user_id)
+        unchanged = (
+            known_status is not None
+            and ride.status == known_status
+            and ride.driver_id == known_driver_id
+            and ride.status not in TERMINAL_RIDE_STATUSES
+        )
+        if not unchanged:
+            return ride
+        
+        if not await ride_events.wait(event, timeout):
+            return ride
+        return await _load_rider_ride(ride_id, user_id)
+    finally:
+        ride_events.unsubscribe(ride_id, event)
+
+
 @router.post("/{ride_id}/start")
-def start_ride(
-    ride_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+async def start_ride(
+    ride_id: UUID,
+    driver: Driver = Depends(get_current_driver),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Driver starts the ride (picked up passenger)."""
     
-    driver = db.query(Driver).filter(Driver.user_id == current_user.id).first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver profile not found"
-        )
-    
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
-    if not ride or str(ride.assigned_driver_id) != str(driver.id):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Ride not found"
-        )
+    moved = await _move_ride(
+        db, ride_id, driver, [RideStatus.MATCHED],
+        {"status": RideStatus.IN_PROGRESS}
+    )
+    if moved is None:
+        raise await _transition_error(db, ride_id, driver, "Ride is not waiting to start", hide_foreign=True)
+    await db.commit()
     
-    ride.status = RideStatus.IN_PROGRESS
-    db.commit()
+    # Record the trip from the pickup point on, to meter the final fare
+    lat, lng = driver_location(driver.id, moved)
+    trajectory_store.start(ride_id, driver.id, lat, lng)
+    ride_events.publish(ride_id)
     
     return {"message": "Ride started"}
 
 
 @router.post("/{ride_id}/complete")
-def complete_ride(
-    ride_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+async def complete_ride(
+    ride_id: UUID,
+    driver: Driver = Depends(get_current_driver),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Driver completes the ride."""
     
-    driver = db.query(Driver).filter(Driver.user_id == current_user.id).first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver profile not found"
-        )
+    # Charge the distance actually driven when the trip was recorded
+    buffered = location_buffer.get(driver.id)
+    if buffered is not None:
+        trajectory_store.record(driver.id, buffered.lat, buffered.lng)
+    trajectory = trajectory_store.get(ride_id)
+    if trajectory is not None and trajectory.driver_id == driver.id and len(trajectory) >= 2:
+        travelled_km = round(trajectory.distance_km(), 2)
+        metered_price = pricing_engine.price(DriverType.TAXI, travelled_km, driver.vehicle_type)
+        final_price = func.round(metered_price * func.coalesce(Ride.surge_multiplier, 1.0))
+    else:
+        trajectory = None
+        final_price = Ride.estimated_price
+    
+    # Complete ride and put the driver back online in one statement
+    moved = await _move_ride(
+        db, ride_id, driver, [RideStatus.MATCHED, RideStatus.IN_PROGRESS],
+        {"status": RideStatus.COMPLETED, "final_price": final_price},
+        driver_status=DriverOnlineStatus.ONLINE
+    )
+    if moved is None:
+        raise await _transition_error(db, ride_id, driver, "Ride is not in progress", hide_foreign=True)
     
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
-    if not ride or str(ride.assigned_driver_id) != str(driver.id):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Ride not found"
-        )
+    if trajectory is not None:
+        db.add(trajectory.to_model(travelled_km))
+    await db.commit()
     
-    ride.status = RideStatus.COMPLETED
-    ride.final_price = ride.estimated_price
-    driver.online_status = DriverOnlineStatus.ONLINE  # Back to online
+    # Recording stops only once the fare is committed, so a retry still meters the trip
+    trajectory_store.finish(ride_id)
     
-    db.commit()
+    driver_index.sync(driver, moved)
+    surge_monitor.sync(driver, moved)
+    ride_events.publish(ride_id)
     
-    return {"message": "Ride completed", "final_price": ride.final_price}
+    return {"message": "Ride completed", "final_price": moved.final_price}
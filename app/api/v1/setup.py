@@ -4,9 +4,11 @@ from pydantic import BaseModel
 
 from app.database import get_db
 from app.models import User
-from app.core.security import get_password_hash
+from app.core.password_pool import password_pool
+from app.core.principal_cache import invalidate_principal
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 class AdminSetup(BaseModel):
@@ -61,7 +63,7 @@ def setup_admin(
     admin_user = User(
         phone=admin_data.phone,
         name=admin_data.name,
-        password_hash=get_password_hash(admin_data.password),
+        password_hash=password_pool.hash_sync(admin_data.password),
         role="admin"
     )
     
@@ -109,16 +111,22 @@ def reset_admin(
             detail="Phone must be 8-15 digits"
         )
     
+    # Hash first so a busy password pool cannot leave the system without an admin
+    password_hash = password_pool.hash_sync(admin_data.password)
+    
     # Delete all existing admin users
+    admin_ids = [row[0] for row in db.query(User.id).filter(User.role == "admin").all()]
     deleted_count = db.query(User).filter(User.role == "admin").delete()
     db.commit()
+    for admin_id in admin_ids:
+        invalidate_principal(admin_id)
     
     # Create new admin user with national_id
     admin_user = User(
         national_id=admin_data.national_id,
         phone=admin_data.phone,
         name=admin_data.name,
-        password_hash=get_password_hash(admin_data.password),
+        password_hash=password_hash,
         role="admin"
     )
     
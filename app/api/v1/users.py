@@ -5,8 +5,10 @@ from app.database import get_db
 from app.schemas import UserResponse, UserUpdate
 from app.models import User
 from app.api.deps import get_current_active_user
+from app.core.principal_cache import invalidate_principal
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.get("/me", response_model=UserResponse)
@@ -22,13 +24,21 @@ def update_current_user_profile(
     db: Session = Depends(get_db)
 ):
     """Update current user profile."""
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
     if user_update.name is not None:
-        current_user.name = user_update.name
+        user.name = user_update.name
     
     if user_update.national_id is not None:
-        current_user.national_id = user_update.national_id
+        user.national_id = user_update.national_id
     
     db.commit()
-    db.refresh(current_user)
+    db.refresh(user)
+    invalidate_principal(user.id)
     
-    return current_user
+    return user
@@ -5,6 +5,10 @@ from typing import List
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    ASYNC_DB_POOL_SIZE: int = 20  # asyncpg pool for the async hot-path endpoints
+    ASYNC_DB_MAX_OVERFLOW: int = 20
+    DATABASE_REPLICA_URLS: str = ""  # comma-separated read replicas; empty sends reads to the primary
+    REPLICA_STALENESS_SECONDS: float = 5.0  # reads go to the primary this long after the user's last write
     
     # Security
     SECRET_KEY: str
@@ -17,6 +21,64 @@ class Settings(BaseSettings):
     # App
     DEBUG: bool = False
     
+    # Ride matching
+    RIDE_OFFER_TIMEOUT_SECONDS: int = 30
+    DISPATCH_WINDOW_SECONDS: float = 1.5  # 0 disables batching (assign on request)
+    DISPATCH_CANDIDATES_PER_RIDE: int = 8
+    
+    # Driver location write-behind buffer
+    LOCATION_FLUSH_INTERVAL_MS: int = 1000
+    LOCATION_MAX_STALENESS_MS: int = 5000
+    LOCATION_FLUSH_BATCH_SIZE: int = 500
+    
+    # Driver WebSocket channel
+    DRIVER_WS_HEARTBEAT_SECONDS: int = 20
+    DRIVER_WS_SEND_QUEUE_SIZE: int = 64
+    
+    # In-progress ride trajectories
+    TRAJECTORY_MAX_POINTS: int = 512  # per ride; older points are thinned out beyond this
+    TRAJECTORY_MIN_STEP_METERS: float = 10.0
+    TRAJECTORY_MAX_RIDES: int = 10000
+    
+    # Pricing
+    PRICING_RELOAD_SECONDS: int = 60
+    PRICING_QUOTE_CELL_DEGREES: float = 0.0005  # ~50 m
+    PRICING_QUOTE_CACHE_SIZE: int = 10000
+    PRICING_QUOTE_TTL_SECONDS: int = 300
+    
+    # Zone surge pricing
+    SURGE_ZONE_DEGREES: float = 0.02  # ~2 km
+    SURGE_WINDOW_SECONDS: int = 600  # decay time constant of the request counters
+    SURGE_RECOMPUTE_SECONDS: int = 15
+    SURGE_SENSITIVITY: float = 0.5  # multiplier added per unit of requests-per-driver above 1
+    SURGE_MAX_MULTIPLIER: float = 2.5
+    
+    # Authenticated user cache
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    
+    # Admin driver lists
+    DRIVER_COUNT_CACHE_SECONDS: int = 60
+    
+    # Trip partitions and archival
+    ARCHIVE_AFTER_DAYS: int = 90  # finished trips older than this move to the archive
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+    ARCHIVE_BATCH_SIZE: int = 5000
+    PARTITION_MONTHS_AHEAD: int = 3  # monthly partitions created in advance
+    
+    # Query instrumentation
+    SLOW_QUERY_MS: int = 200  # statements at least this slow are logged; 0 turns the log off
+    
+    # Request profiling
+    PROFILE_INTERVAL_MS: float = 1.0  # profiler sampling interval
+    PROFILE_SAMPLE_RATE: float = 0.0  # fraction of requests profiled at random; 0 turns sampling off
+    PROFILE_SAMPLES_PER_MINUTE: int = 6
+    PROFILE_KEEP_SLOWEST: int = 5  # sampled profiles kept per route
+    
+    # Password hashing process pool
+    PASSWORD_POOL_WORKERS: int = 2
+    PASSWORD_POOL_MAX_PENDING: int = 32  # further logins get 503 until the queue drains
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
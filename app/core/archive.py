@@ -0,0 +1,362 @@
+# Monthly trip partitions and archival of finished trips
+import asyncio
+import json
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import Dict, List, Optional, Tuple, Union
+from uuid import UUID
+
+from sqlalchemy import DateTime, Enum as SQLEnum, select, text
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models import (
+    Delivery, DeliveryArchive, DeliveryArchiveEntry, DeliveryStatus,
+    Ride, RideArchive, RideArchiveEntry, RideStatus
+)
+from app.utils.partitions import PARTITIONED_TABLES, add_months, month_start, partition_month, partition_name
+
+# Trip model -> (archive model, trip -> batch model, statuses after which a trip never changes)
+ARCHIVES = {
+    Ride: (RideArchive, RideArchiveEntry, (RideStatus.COMPLETED, RideStatus.CANCELLED)),
+    Delivery: (DeliveryArchive, DeliveryArchiveEntry, (DeliveryStatus.DELIVERED, DeliveryStatus.CANCELLED)),
+}
+
+# Advisory lock key, so one worker archives at a time
+ARCHIVE_LOCK_KEY = 720221
+
+
+def archive_horizon() -> datetime:
+    """Every archived trip was created before this moment."""
+    return datetime.utcnow() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def _encode(value):
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, SQLEnum):
+        return column.type.enum_class[value]
+    if isinstance(column.type, PGUUID):
+        return UUID(value)
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def pack_trips(trips: list) -> bytes:
+    """Serialize trips of one model column by column into a compressed payload."""
+    columns = [column.name for column in trips[0].__table__.columns]
+    rows = [[_encode(getattr(trip, name)) for name in columns] for trip in trips]
+    raw = json.dumps({"columns": columns, "rows": rows}, separators=(",", ":"))
+    return zlib.compress(raw.encode(), 9)
+
+
+def unpack_trips(model, payload: bytes) -> list:
+    """
+    Rebuild the trips of a payload as detached model instances.
+
+    Columns added after archiving come back as None; dropped ones are ignored.
+    """
+    data = json.loads(zlib.decompress(payload))
+    columns = model.__table__.columns
+    return [
+        model(**{
+            name: _decode(columns[name], value)
+            for name, value in zip(data["columns"], row)
+            if name in columns
+        })
+        for row in data["rows"]
+    ]
+
+
+async def find_archived_trip(db, model, user_id: UUID, trip_id: UUID):
+    """Look a trip of the user up in the archive (cold path: decompresses the one batch holding it)."""
+    archive_model, entry_model, _ = ARCHIVES[model]
+    payload = await db.scalar(
+        select(archive_model.payload).join(
+            entry_model, entry_model.batch_id == archive_model.id
+        ).where(
+            entry_model.trip_id == trip_id,
+            archive_model.user_id == user_id
+        )
+    )
+    if payload is None:
+        return None
+    for trip in unpack_trips(model, payload):
+        if trip.id == trip_id:
+            return trip
+    return None
+
+
+async def archived_history(db, model, user_id: UUID, before: Optional[Tuple[datetime, UUID]], limit: int) -> list:
+    """
+    A user's archived trips, newest first.
+
+    Args:
+        before: Only trips strictly before this (created_at, id) key
+        limit: Maximum number of trips
+
+    Batches can overlap in time, so they are opened newest first until the
+    next one cannot hold anything newer than the trips already found.
+    """
+    archive_model, _, _ = ARCHIVES[model]
+    query = select(archive_model.id, archive_model.last_created_at).where(archive_model.user_id == user_id)
+    if before is not None:
+        query = query.where(archive_model.first_created_at <= before[0])
+    batches = (await db.execute(query.order_by(archive_model.last_created_at.desc()))).all()
+
+    trips = []
+    for batch_id, last_created_at in batches:
+        if len(trips) >= limit and last_created_at < trips[limit - 1].created_at:
+            break
+        payload = await db.scalar(select(archive_model.payload).where(archive_model.id == batch_id))
+        trips.extend(
+            trip for trip in unpack_trips(model, payload)
+            if before is None or (trip.created_at, trip.id) < before
+        )
+        trips.sort(key=lambda trip: (trip.created_at, trip.id), reverse=True)
+    return trips[:limit]
+
+
+def _partitions(db, table: str, detach_pending: bool = False) -> Dict[date, str]:
+    """
+    Monthly partitions of a table by the month they cover.
+
+    Args:
+        detach_pending: Only partitions left half detached by an interrupted
+            DETACH PARTITION ... CONCURRENTLY
+    """
+    names = db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "WHERE parent.relname = :table"
+            + (" AND pg_inherits.inhdetachpending" if detach_pending else "")
+        ),
+        {"table": table}
+    ).scalars()
+    return {partition_month(name): name for name in names if partition_month(name) is not None}
+
+
+def _detached_partitions(db, table: str) -> Dict[date, str]:
+    """Former monthly partitions of a table that were detached but not dropped."""
+    names = db.execute(
+        text(
+            "SELECT relname FROM pg_class "
+            "WHERE relkind = 'r' AND NOT relispartition AND starts_with(relname, :prefix)"
+        ),
+        {"prefix": f"{table}_p"}
+    ).scalars()
+    return {partition_month(name): name for name in names if partition_month(name) is not None}
+
+
+def missing_partitions(db, first: Union[date, datetime], last: Union[date, datetime]) -> List[Tuple[str, date]]:
+    """
+    Monthly partitions of every trip table missing between two dates, as (table, month).
+
+    Args:
+        first: Date in the first month to cover
+        last: Date in the last month to cover
+    """
+    missing = []
+    for table in PARTITIONED_TABLES:
+        existing = _partitions(db, table)
+        month = month_start(first)
+        while month <= month_start(last):
+            if month not in existing:
+                missing.append((table, month))
+            month = add_months(month, 1)
+    return missing
+
+
+def create_partitions(db, first: Union[date, datetime], last: Union[date, datetime]) -> int:
+    """
+    Create the missing monthly partitions of every trip table, without committing.
+
+    Args:
+        first: Date in the first month to cover
+        last: Date in the last month to cover
+
+    Returns:
+        Number of partitions created
+    """
+    missing = missing_partitions(db, first, last)
+    for table, month in missing:
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        ))
+    return len(missing)
+
+
+def _try_lock(db) -> bool:
+    return db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ARCHIVE_LOCK_KEY}).scalar()
+
+
+class TripArchiver:
+    """
+    Keeps the trip tables, and so their indexes, limited to recent trips.
+
+    Every ARCHIVE_INTERVAL_SECONDS it creates the monthly partitions of the
+    next PARTITION_MONTHS_AHEAD months, moves completed and cancelled trips
+    older than ARCHIVE_AFTER_DAYS into compressed per-user batches (still
+    served by the history endpoints), and drops partitions left empty.
+    Trips that never finished stay where they are.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_partitions(self, db) -> int:
+        """Create the partitions from this month through PARTITION_MONTHS_AHEAD months ahead and commit."""
+        current = month_start(datetime.utcnow())
+        created = create_partitions(db, current, add_months(current, settings.PARTITION_MONTHS_AHEAD))
+        db.commit()
+        return created
+
+    def archive(self, db, model, horizon: datetime) -> int:
+        """Move finished trips created before `horizon` into the archive. Returns the number moved."""
+        archive_model, entry_model, final_statuses = ARCHIVES[model]
+        moved = 0
+        while True:
+            if not _try_lock(db):
+                db.rollback()
+                return moved
+            trips = db.query(model).filter(
+                model.created_at < horizon,
+                model.status.in_(final_statuses)
+            ).order_by(model.user_id).limit(settings.ARCHIVE_BATCH_SIZE).all()
+            if not trips:
+                db.rollback()
+                return moved
+
+            batches: Dict[Tuple[UUID, date], List] = defaultdict(list)
+            for trip in trips:
+                batches[(trip.user_id, month_start(trip.created_at))].append(trip)
+            for (user_id, month), group in batches.items():
+                batch = archive_model(
+                    id=uuid.uuid4(),
+                    user_id=user_id,
+                    month=month,
+                    trip_count=len(group),
+                    first_created_at=min(trip.created_at for trip in group),
+                    last_created_at=max(trip.created_at for trip in group),
+                    payload=pack_trips(group)
+                )
+                db.add(batch)
+                db.add_all(entry_model(trip_id=trip.id, batch_id=batch.id) for trip in group)
+            db.query(model).filter(
+                model.id.in_([trip.id for trip in trips]),
+                model.created_at < horizon
+            ).delete(synchronize_session=False)
+            db.commit()
+            db.expunge_all()
+
+            moved += len(trips)
+            if len(trips) < settings.ARCHIVE_BATCH_SIZE:
+                return moved
+
+    def drop_empty_partitions(self, db, horizon: datetime) -> int:
+        """
+        Drop partitions entirely before `horizon` that hold no trips any more.
+
+        DROP TABLE on an attached partition locks the whole parent table, so
+        each partition is first detached with DETACH PARTITION ... CONCURRENTLY
+        (which cannot run inside a transaction) and dropped once detached.
+        Partitions left detached by an interrupted pass are finished first.
+        """
+        dropped = 0
+        with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ARCHIVE_LOCK_KEY}).scalar():
+                return dropped
+            try:
+                for table in PARTITIONED_TABLES:
+                    for name in _partitions(conn, table, detach_pending=True).values():
+                        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} FINALIZE"))
+                    for month, name in sorted(_detached_partitions(conn, table).items()):
+                        dropped += self._drop_detached(conn, table, month, name)
+
+                    for month, name in sorted(_partitions(conn, table).items()):
+                        if add_months(month, 1) > month_start(horizon):
+                            continue
+                        if conn.execute(text(f"SELECT NOT EXISTS (SELECT 1 FROM {name})")).scalar():
+                            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY"))
+                            dropped += self._drop_detached(conn, table, month, name)
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ARCHIVE_LOCK_KEY})
+        return dropped
+
+    def _drop_detached(self, conn, table: str, month: date, name: str) -> int:
+        """Drop a detached partition if still empty, else attach it back. Returns the number dropped."""
+        if conn.execute(text(f"SELECT NOT EXISTS (SELECT 1 FROM {name})")).scalar():
+            conn.execute(text(f"DROP TABLE {name}"))
+            return 1
+        conn.execute(text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        ))
+        return 0
+
+    def run_once(self, db) -> Dict[str, int]:
+        """One maintenance pass over the trip tables."""
+        horizon = archive_horizon()
+        return {
+            "partitions_created": self.ensure_partitions(db),
+            "rides_archived": self.archive(db, Ride, horizon),
+            "deliveries_archived": self.archive(db, Delivery, horizon),
+            "partitions_dropped": self.drop_empty_partitions(db, horizon),
+        }
+
+    async def run(self, run_now: bool = False) -> None:
+        """Maintenance loop, one pass every ARCHIVE_INTERVAL_SECONDS (the first right away with `run_now`)."""
+        from app.database import SessionLocal
+
+        def tick():
+            db = SessionLocal()
+            try:
+                result = self.run_once(db)
+                if any(result.values()):
+                    print(f"✅ Trip archive pass: {result}")
+            except Exception as e:
+                db.rollback()
+                print(f"❌ Trip archive error: {str(e)}")
+            finally:
+                db.close()
+
+        while True:
+            if not run_now:
+                await asyncio.sleep(settings.ARCHIVE_INTERVAL_SECONDS)
+            run_now = False
+            await run_in_threadpool(tick)
+
+    def start(self, run_now: bool = False) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run(run_now))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Process-wide archiver
+trip_archiver = TripArchiver()
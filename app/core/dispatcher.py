@@ -0,0 +1,325 @@
+# Batched ride dispatcher
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.core.driver_index import driver_index
+from app.core.matching import announce_offer, build_offer, offer_ride
+from app.core.metrics import RIDES_CANCELLED
+from app.core.ride_events import ride_events
+from app.models import Ride, RideStatus
+from app.utils.location import distance_matrix
+
+logger = logging.getLogger(__name__)
+
+# Cost used for forbidden rider/driver pairs
+UNASSIGNABLE_COST = 1e9
+
+
+@dataclass
+class QueuedRide:
+    ride_id: UUID
+    pickup_lat: float
+    pickup_lng: float
+    queued_at: float
+    exclude: Set[UUID] = field(default_factory=set)
+
+
+def solve_assignment(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Minimum-cost assignment (Hungarian algorithm with potentials).
+
+    Args:
+        cost: N x M cost matrix
+
+    Returns:
+        List of (row, col) pairs, one per row when N <= M, one per column otherwise
+    """
+    n, m = cost.shape
+    if n == 0 or m == 0:
+        return []
+    if n > m:
+        return [(row, col) for col, row in solve_assignment(cost.T)]
+
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)  # row (1-based) assigned to each column
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for row in range(1, n + 1):
+        owner[0] = row
+        col0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+
+        while True:
+            used[col0] = True
+            row0 = owner[col0]
+            free = ~used[1:]
+
+            reduced = cost[row0 - 1] - u[row0] - v[1:]
+            improve = free & (reduced < minv[1:])
+            minv[1:][improve] = reduced[improve]
+            way[1:][improve] = col0
+
+            candidates = np.where(free, minv[1:], np.inf)
+            col1 = int(np.argmin(candidates)) + 1
+            delta = candidates[col1 - 1]
+
+            used_cols = np.flatnonzero(used)
+            u[owner[used_cols]] += delta
+            v[used_cols] -= delta
+            minv[1:][free] -= delta
+
+            col0 = col1
+            if owner[col0] == 0:
+                break
+
+        while col0:
+            col1 = way[col0]
+            owner[col0] = owner[col1]
+            col0 = col1
+
+    return [(int(owner[col]) - 1, col - 1) for col in range(1, m + 1) if owner[col]]
+
+
+def greedy_assignment(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """Assign rows in order to their cheapest still-free column."""
+    taken: Set[int] = set()
+    pairs = []
+    for row in range(cost.shape[0]):
+        for col in np.argsort(cost[row]).tolist():
+            if col in taken or cost[row, col] >= UNASSIGNABLE_COST:
+                continue
+            taken.add(col)
+            pairs.append((row, col))
+            break
+    return pairs
+
+
+class RideDispatcher:
+    """
+    Collects ride requests for a short window and assigns them in one batch.
+
+    Each tick builds a pickup-distance matrix between the queued rides and
+    the union of their nearest available drivers, then solves the global
+    assignment so that two simultaneous requests never compete for the same
+    driver. Drivers holding an unanswered offer are skipped until it expires.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue: Dict[UUID, QueuedRide] = {}
+        self._offers: Dict[UUID, float] = {}  # driver_id -> offer expiry (monotonic)
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "ticks": 0,
+            "rides_assigned": 0,
+            "rides_cancelled": 0,
+            "pickup_km_total": 0.0,
+            "greedy_pickup_km_total": 0.0,
+            "pickup_km_saved": 0.0,
+            "extra_matches_vs_greedy": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return settings.DISPATCH_WINDOW_SECONDS > 0
+
+    def submit(self, ride_id: UUID, pickup_lat: float, pickup_lng: float, exclude: Optional[Set[UUID]] = None) -> None:
+        """Queue a ride for the next dispatch tick."""
+        with self._lock:
+            self._queue[ride_id] = QueuedRide(
+                ride_id=ride_id,
+                pickup_lat=pickup_lat,
+                pickup_lng=pickup_lng,
+                queued_at=time.monotonic(),
+                exclude=set(exclude or ())
+            )
+
+    def discard(self, ride_id: UUID) -> None:
+        """Drop a ride from the queue (e.g. cancelled by the rider)."""
+        with self._lock:
+            self._queue.pop(ride_id, None)
+
+    def release_driver(self, driver_id: UUID) -> None:
+        """Forget an outstanding offer once the driver has answered it."""
+        with self._lock:
+            self._offers.pop(driver_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "queued_rides": len(self._queue),
+                "outstanding_offers": len(self._offers),
+                "window_seconds": settings.DISPATCH_WINDOW_SECONDS,
+            }
+
+    def recover(self, db) -> int:
+        """Re-queue pending rides that never got a driver (e.g. after a restart)."""
+        rows = db.query(Ride.id, Ride.pickup_lat, Ride.pickup_lng).filter(
+            Ride.status == RideStatus.PENDING,
+            Ride.assigned_driver_id.is_(None)
+        ).all()
+        for row in rows:
+            self.submit(row[0], row[1], row[2])
+        return len(rows)
+
+    def dispatch_once(self, db) -> int:
+        """
+        Run one assignment round. Returns the number of rides assigned.
+
+        If the round fails (e.g. the connection drops), its rides go back to
+        the queue for the next tick and the error is re-raised.
+        """
+        now = time.monotonic()
+        with self._lock:
+            batch = list(self._queue.values())
+            self._queue.clear()
+            self._offers = {d: exp for d, exp in self._offers.items() if exp > now}
+            busy = set(self._offers)
+        if not batch:
+            return 0
+
+        try:
+            return self._assign(db, batch, busy, now)
+        except Exception:
+            # Rides the round did commit are no longer unassigned and get skipped next tick
+            with self._lock:
+                for queued in batch:
+                    self._queue.setdefault(queued.ride_id, queued)
+            raise
+
+    def _assign(self, db, batch: List[QueuedRide], busy: Set[UUID], now: float) -> int:
+        """Offer a batch of queued rides to the available drivers and commit."""
+        rides = {
+            ride.id: ride for ride in db.query(Ride).filter(
+                Ride.id.in_([queued.ride_id for queued in batch]),
+                Ride.status == RideStatus.PENDING,
+                Ride.assigned_driver_id.is_(None)
+            ).all()
+        }
+        batch = [queued for queued in batch if queued.ride_id in rides]
+        if not batch:
+            return 0
+
+        # Union of each ride's nearest available drivers
+        drivers = {}
+        for queued in batch:
+            for entry, _ in driver_index.nearest(
+                queued.pickup_lat,
+                queued.pickup_lng,
+                k=settings.DISPATCH_CANDIDATES_PER_RIDE,
+                exclude=busy | queued.exclude
+            ):
+                drivers[entry.driver_id] = entry
+        candidates = list(drivers.values())
+
+        pairs: List[Tuple[int, int]] = []
+        greedy_pairs: List[Tuple[int, int]] = []
+        cost = np.empty((len(batch), 0))
+        if candidates:
+            cost = distance_matrix(
+                [queued.pickup_lat for queued in batch],
+                [queued.pickup_lng for queued in batch],
+                [entry.lat for entry in candidates],
+                [entry.lng for entry in candidates]
+            )
+            for row, queued in enumerate(batch):
+                for col, entry in enumerate(candidates):
+                    if entry.driver_id in queued.exclude:
+                        cost[row, col] = UNASSIGNABLE_COST
+            pairs = [(r, c) for r, c in solve_assignment(cost) if cost[r, c] < UNASSIGNABLE_COST]
+            greedy_pairs = greedy_assignment(cost)
+
+        offer_expiry = now + settings.RIDE_OFFER_TIMEOUT_SECONDS
+        assigned_rows = set()
+        offers = []
+        for row, col in pairs:
+            ride = rides[batch[row].ride_id]
+            offer_ride(ride, candidates[col])
+            offers.append(build_offer(ride))
+            assigned_rows.add(row)
+
+        # Rides left over wait for the next tick, unless nobody could ever take them
+        cancelled = []
+        requeue = []
+        for row, queued in enumerate(batch):
+            if row in assigned_rows:
+                continue
+            if not np.any(cost[row] < UNASSIGNABLE_COST):
+                if not driver_index.nearest(queued.pickup_lat, queued.pickup_lng, k=1, exclude=queued.exclude):
+                    rides[queued.ride_id].status = RideStatus.CANCELLED
+                    cancelled.append(queued.ride_id)
+                    continue
+            requeue.append(queued)
+
+        db.commit()
+        for offer in offers:
+            announce_offer(offer)
+        for ride_id in cancelled:
+            ride_events.publish(ride_id)
+        RIDES_CANCELLED.inc(len(cancelled))
+
+        optimal_km = float(sum(cost[r, c] for r, c in pairs))
+        greedy_km = float(sum(cost[r, c] for r, c in greedy_pairs))
+        with self._lock:
+            for queued in requeue:
+                self._queue.setdefault(queued.ride_id, queued)
+            for _, col in pairs:
+                self._offers[candidates[col].driver_id] = offer_expiry
+            self._stats["ticks"] += 1
+            self._stats["rides_assigned"] += len(pairs)
+            self._stats["rides_cancelled"] += len(cancelled)
+            self._stats["pickup_km_total"] += optimal_km
+            self._stats["greedy_pickup_km_total"] += greedy_km
+            if len(pairs) == len(greedy_pairs):
+                self._stats["pickup_km_saved"] += greedy_km - optimal_km
+            else:
+                self._stats["extra_matches_vs_greedy"] += len(pairs) - len(greedy_pairs)
+
+        return len(pairs)
+
+    async def run(self) -> None:
+        """Dispatch loop, one tick every DISPATCH_WINDOW_SECONDS."""
+        from app.database import SessionLocal
+
+        def tick():
+            db = SessionLocal()
+            try:
+                self.dispatch_once(db)
+            except Exception:
+                db.rollback()
+                logger.exception("Dispatch round failed; its rides stay queued")
+            finally:
+                db.close()
+
+        while True:
+            await asyncio.sleep(settings.DISPATCH_WINDOW_SECONDS)
+            await run_in_threadpool(tick)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Process-wide dispatcher shared by all requests
+ride_dispatcher = RideDispatcher()
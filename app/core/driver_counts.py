@@ -0,0 +1,43 @@
+# Cached driver totals for the admin lists
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import func
+
+from app.config import settings
+from app.models import Driver, DriverStatus
+
+
+class DriverCounts:
+    """
+    Number of drivers per application status.
+
+    One GROUP BY query refreshes all statuses at once, at most every
+    DRIVER_COUNT_CACHE_SECONDS; status changes made through this process
+    invalidate it right away, other workers catch up within the TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Optional[Dict[DriverStatus, int]] = None
+        self._expires = 0.0
+
+    def get(self, db, driver_status: DriverStatus) -> int:
+        with self._lock:
+            counts = self._counts if time.monotonic() < self._expires else None
+        if counts is None:
+            rows = db.query(Driver.status, func.count(Driver.id)).group_by(Driver.status).all()
+            counts = {row[0]: row[1] for row in rows}
+            with self._lock:
+                self._counts = counts
+                self._expires = time.monotonic() + settings.DRIVER_COUNT_CACHE_SECONDS
+        return counts.get(driver_status, 0)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._counts = None
+
+
+# Process-wide counter shared by all requests
+driver_counts = DriverCounts()
@@ -0,0 +1,252 @@
+# In-memory spatial index of online taxi drivers
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from app.models import Driver, DriverLiveState, DriverOnlineStatus, DriverStatus, DriverType
+from app.utils.location import distances_from
+
+# Grid cell size in degrees (~1.1 km of latitude)
+CELL_SIZE_DEG = 0.01
+KM_PER_DEG_LAT = 111.195
+
+
+@dataclass
+class IndexedDriver:
+    driver_id: UUID
+    user_id: UUID
+    lat: float
+    lng: float
+
+
+def _cell_of(lat: float, lng: float) -> Tuple[int, int]:
+    return (math.floor(lat / CELL_SIZE_DEG), math.floor(lng / CELL_SIZE_DEG))
+
+
+def is_available(driver: Driver, live: DriverLiveState) -> bool:
+    """Check if a driver should be offered new rides once its location is known."""
+    return (
+        driver.status == DriverStatus.APPROVED
+        and driver.driver_type == DriverType.TAXI
+        and live.online_status == DriverOnlineStatus.ONLINE
+    )
+
+
+class DriverIndex:
+    """
+    Uniform lat/lng grid of available taxi drivers.
+
+    Each driver lives in exactly one cell. Nearest-driver queries scan the
+    rings of cells around the origin and stop as soon as no unvisited ring
+    can hold a closer driver than the k-th best found so far. Available
+    drivers without a known location wait outside the grid until their
+    first location update.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._drivers: Dict[UUID, IndexedDriver] = {}
+        self._cells: Dict[Tuple[int, int], Dict[UUID, IndexedDriver]] = {}
+        self._awaiting_location: Dict[UUID, UUID] = {}  # driver_id -> user_id
+
+    def __len__(self) -> int:
+        return len(self._drivers)
+
+    def __contains__(self, driver_id: UUID) -> bool:
+        return driver_id in self._drivers
+
+    def upsert(self, driver_id: UUID, user_id: UUID, lat: float, lng: float) -> None:
+        """Insert a driver or move it to a new position."""
+        with self._lock:
+            self._remove_locked(driver_id)
+            self._insert_locked(IndexedDriver(driver_id=driver_id, user_id=user_id, lat=lat, lng=lng))
+
+    def move(self, driver_id: UUID, lat: float, lng: float) -> bool:
+        """Update the position of an available driver. Returns False if it is not available."""
+        with self._lock:
+            entry = self._drivers.get(driver_id)
+            if entry is None:
+                user_id = self._awaiting_location.pop(driver_id, None)
+                if user_id is None:
+                    return False
+                self._insert_locked(IndexedDriver(driver_id=driver_id, user_id=user_id, lat=lat, lng=lng))
+                return True
+            old_cell = _cell_of(entry.lat, entry.lng)
+            new_cell = _cell_of(lat, lng)
+            entry.lat = lat
+            entry.lng = lng
+            if old_cell != new_cell:
+                self._discard_from_cell(old_cell, driver_id)
+                self._cells.setdefault(new_cell, {})[driver_id] = entry
+            return True
+
+    def remove(self, driver_id: UUID) -> None:
+        """Remove a driver from the index if present."""
+        with self._lock:
+            self._remove_locked(driver_id)
+
+    def sync(self, driver: Driver, live: DriverLiveState) -> None:
+        """
+        Add or remove a driver depending on whether it can take rides.
+
+        Args:
+            driver: Profile fields (id, user_id, status, driver_type)
+            live: Live state fields (online_status and location)
+        """
+        if not is_available(driver, live):
+            self.remove(driver.id)
+        elif live.current_location_lat is None or live.current_location_lng is None:
+            with self._lock:
+                self._remove_locked(driver.id)
+                self._awaiting_location[driver.id] = driver.user_id
+        else:
+            self.upsert(
+                driver.id,
+                driver.user_id,
+                live.current_location_lat,
+                live.current_location_lng
+            )
+
+    def load(self, drivers: Iterable[IndexedDriver]) -> None:
+        """Replace the whole index content. Entries without a location await their first update."""
+        with self._lock:
+            self._drivers.clear()
+            self._cells.clear()
+            self._awaiting_location.clear()
+            for entry in drivers:
+                if entry.lat is None or entry.lng is None:
+                    self._awaiting_location[entry.driver_id] = entry.user_id
+                else:
+                    self._insert_locked(entry)
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int = 1,
+        radius_km: Optional[float] = None,
+        exclude: Optional[Set[UUID]] = None
+    ) -> List[Tuple[IndexedDriver, float]]:
+        """
+        Find the k nearest indexed drivers.
+
+        Args:
+            lat, lng: Search origin
+            k: Maximum number of drivers to return
+            radius_km: Optional search radius in kilometers
+            exclude: Driver IDs to skip
+
+        Returns:
+            List of (driver, distance_km) sorted by distance
+        """
+        exclude = exclude or set()
+        origin_row, origin_col = _cell_of(lat, lng)
+        found: List[Tuple[IndexedDriver, float]] = []
+
+        with self._lock:
+            total_cells = len(self._cells)
+            visited_cells = 0
+            ring = 0
+
+            while visited_cells < total_cells:
+                # Any driver in this ring is at least (ring - 1) cells away
+                ring_min_km = max(0, ring - 1) * CELL_SIZE_DEG * KM_PER_DEG_LAT * math.cos(
+                    math.radians(min(89.0, abs(lat) + ring * CELL_SIZE_DEG))
+                )
+                if radius_km is not None and ring_min_km > radius_km:
+                    break
+                if len(found) >= k and ring_min_km > found[k - 1][1]:
+                    break
+
+                # Once a ring is wider than the occupied cells, scan those directly
+                if 8 * ring > total_cells - visited_cells:
+                    cells = [
+                        cell for (row, col), cell in self._cells.items()
+                        if max(abs(row - origin_row), abs(col - origin_col)) >= ring
+                    ]
+                    visited_cells = total_cells
+                else:
+                    cells = []
+                    for row, col in _ring_cells(origin_row, origin_col, ring):
+                        cell = self._cells.get((row, col))
+                        if cell:
+                            cells.append(cell)
+                    visited_cells += len(cells)
+
+                entries = [
+                    entry for cell in cells for entry in cell.values()
+                    if entry.driver_id not in exclude
+                ]
+                if entries:
+                    dists = distances_from(
+                        lat, lng,
+                        [entry.lat for entry in entries],
+                        [entry.lng for entry in entries]
+                    )
+                    for entry, dist in zip(entries, dists.tolist()):
+                        if radius_km is None or dist <= radius_km:
+                            found.append((entry, dist))
+
+                found.sort(key=lambda x: x[1])
+                del found[k:]
+                ring += 1
+
+        return found
+
+    def _insert_locked(self, entry: IndexedDriver) -> None:
+        self._drivers[entry.driver_id] = entry
+        self._cells.setdefault(_cell_of(entry.lat, entry.lng), {})[entry.driver_id] = entry
+
+    def _remove_locked(self, driver_id: UUID) -> None:
+        self._awaiting_location.pop(driver_id, None)
+        entry = self._drivers.pop(driver_id, None)
+        if entry is not None:
+            self._discard_from_cell(_cell_of(entry.lat, entry.lng), driver_id)
+
+    def _discard_from_cell(self, cell_key: Tuple[int, int], driver_id: UUID) -> None:
+        cell = self._cells.get(cell_key)
+        if cell is not None:
+            cell.pop(driver_id, None)
+            if not cell:
+                del self._cells[cell_key]
+
+
+def _ring_cells(row: int, col: int, ring: int) -> Iterable[Tuple[int, int]]:
+    """Yield the cells at Chebyshev distance `ring` from (row, col)."""
+    if ring == 0:
+        yield (row, col)
+        return
+    for c in range(col - ring, col + ring + 1):
+        yield (row - ring, c)
+        yield (row + ring, c)
+    for r in range(row - ring + 1, row + ring):
+        yield (r, col - ring)
+        yield (r, col + ring)
+
+
+def load_driver_index(db) -> int:
+    """Populate the index from the driver tables. Returns the number of drivers loaded."""
+    rows = db.query(
+        Driver.id,
+        Driver.user_id,
+        DriverLiveState.current_location_lat,
+        DriverLiveState.current_location_lng
+    ).join(
+        DriverLiveState, DriverLiveState.driver_id == Driver.id
+    ).filter(
+        DriverLiveState.online_status == DriverOnlineStatus.ONLINE,
+        Driver.status == DriverStatus.APPROVED,
+        Driver.driver_type == DriverType.TAXI
+    ).all()
+
+    driver_index.load(
+        IndexedDriver(driver_id=row[0], user_id=row[1], lat=row[2], lng=row[3])
+        for row in rows
+    )
+    return len(rows)
+
+
+# Process-wide index shared by all requests
+driver_index = DriverIndex()
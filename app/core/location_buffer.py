@@ -0,0 +1,196 @@
+# Write-behind buffer for driver location pings
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BufferedLocation:
+    lat: float
+    lng: float
+    recorded_at: datetime  # time of the latest ping (UTC)
+    buffered_at: float  # monotonic time of the oldest unflushed ping
+
+
+class LocationBuffer:
+    """
+    Coalesces location pings per driver and writes them in bulk.
+
+    Only the latest point per driver is kept. A background task flushes the
+    buffer every LOCATION_FLUSH_INTERVAL_MS with one UPDATE ... FROM (VALUES
+    ...) statement per batch, and keeps flushing extra batches while the
+    oldest point is older than LOCATION_MAX_STALENESS_MS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[UUID, BufferedLocation] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, driver_id: UUID, lat: float, lng: float) -> BufferedLocation:
+        """Buffer the latest location of a driver."""
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._pending.get(driver_id)
+            if entry is None:
+                entry = BufferedLocation(lat=lat, lng=lng, recorded_at=now, buffered_at=time.monotonic())
+                self._pending[driver_id] = entry
+            else:
+                entry.lat = lat
+                entry.lng = lng
+                entry.recorded_at = now
+            return entry
+
+    def get(self, driver_id: UUID) -> Optional[BufferedLocation]:
+        """Latest unflushed location of a driver, if any."""
+        return self._pending.get(driver_id)
+
+    def discard(self, driver_id: UUID, up_to: Optional[datetime] = None) -> None:
+        """
+        Drop a buffered point (e.g. superseded by a direct write).
+
+        Args:
+            up_to: Keep the point if a ping newer than this arrived meanwhile
+        """
+        with self._lock:
+            entry = self._pending.get(driver_id)
+            if entry is not None and (up_to is None or entry.recorded_at <= up_to):
+                del self._pending[driver_id]
+
+    def _take_batch(self, limit: int) -> List[Tuple[UUID, BufferedLocation]]:
+        with self._lock:
+            batch = []
+            for driver_id in list(islice(self._pending, limit)):
+                batch.append((driver_id, self._pending.pop(driver_id)))
+            return batch
+
+    def _restore(self, batch: List[Tuple[UUID, BufferedLocation]]) -> None:
+        # Put the batch back in front, so the first entry stays the oldest
+        with self._lock:
+            restored = {}
+            for driver_id, entry in batch:
+                newer = self._pending.pop(driver_id, None)
+                if newer is not None:
+                    # Keep the newer ping that arrived while the flush was failing,
+                    # but it has been waiting since the failed one
+                    newer.buffered_at = entry.buffered_at
+                    entry = newer
+                restored[driver_id] = entry
+            restored.update(self._pending)
+            self._pending = restored
+
+    def _oldest_age_ms(self) -> float:
+        with self._lock:
+            if not self._pending:
+                return 0.0
+            oldest = next(iter(self._pending.values()))
+            return (time.monotonic() - oldest.buffered_at) * 1000
+
+    def flush_once(self, db, limit: Optional[int] = None) -> int:
+        """Write one batch to the driver_live_state table. Returns the number of rows written."""
+        batch = self._take_batch(limit or settings.LOCATION_FLUSH_BATCH_SIZE)
+        if not batch:
+            return 0
+
+        values = []
+        params = {}
+        for i, (driver_id, entry) in enumerate(batch):
+            values.append(
+                f"(CAST(:id_{i} AS UUID), CAST(:lat_{i} AS DOUBLE PRECISION), "
+                f"CAST(:lng_{i} AS DOUBLE PRECISION), CAST(:ts_{i} AS TIMESTAMP))"
+            )
+            params[f"id_{i}"] = str(driver_id)
+            params[f"lat_{i}"] = entry.lat
+            params[f"lng_{i}"] = entry.lng
+            params[f"ts_{i}"] = entry.recorded_at
+
+        # Only the narrow live-state rows are rewritten, never driver profiles
+        statement = text(
+            "UPDATE driver_live_state AS l SET "
+            "current_location_lat = v.lat, "
+            "current_location_lng = v.lng, "
+            "last_location_update = v.ts "
+            f"FROM (VALUES {', '.join(values)}) AS v(id, lat, lng, ts) "
+            "WHERE l.driver_id = v.id"
+        )
+        try:
+            db.execute(statement, params)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._restore(batch)
+            raise
+        return len(batch)
+
+    def flush(self, db) -> int:
+        """Flush one batch, plus more while points are older than the staleness bound."""
+        written = self.flush_once(db)
+        while self._pending and self._oldest_age_ms() > settings.LOCATION_MAX_STALENESS_MS:
+            written += self.flush_once(db)
+        return written
+
+    def flush_all(self, db) -> int:
+        written = 0
+        while self._pending:
+            written += self.flush_once(db)
+        return written
+
+    async def run(self) -> None:
+        """Flush loop, one pass every LOCATION_FLUSH_INTERVAL_MS."""
+        from app.database import SessionLocal
+
+        def tick():
+            db = SessionLocal()
+            try:
+                self.flush(db)
+            except Exception:
+                logger.exception("Location flush failed; its points stay buffered")
+            finally:
+                db.close()
+
+        while True:
+            await asyncio.sleep(settings.LOCATION_FLUSH_INTERVAL_MS / 1000)
+            if self._pending:
+                await run_in_threadpool(tick)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write out everything still buffered."""
+        from app.database import SessionLocal
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        db = SessionLocal()
+        try:
+            await run_in_threadpool(self.flush_all, db)
+        finally:
+            db.close()
+
+
+# Process-wide buffer shared by all requests
+location_buffer = LocationBuffer()
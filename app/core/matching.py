@@ -0,0 +1,192 @@
+# Ride offer assignment and expiry
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Optional, Tuple
+from uuid import UUID
+
+from app.config import settings
+from app.core.driver_index import IndexedDriver, driver_index
+from app.core.metrics import RIDES_CANCELLED
+from app.core.realtime import driver_hub
+from app.core.ride_events import ride_events
+from app.core.timer_wheel import timer_wheel
+from app.models import Ride, RideStatus
+from app.schemas import RideResponse
+
+
+@dataclass
+class RideOffer:
+    ride_id: UUID
+    driver_id: UUID
+    deadline: datetime
+    ride: dict  # RideResponse payload sent to the driver
+
+
+@dataclass
+class Reassignment:
+    """What prepare_reassignment did to a ride, for finish_reassignment to announce after commit."""
+    ride_id: UUID
+    previous_driver_id: Optional[UUID]
+    offer: Optional[RideOffer] = None  # offered straight to the next nearest driver
+    pickup: Optional[Tuple[float, float]] = None  # handed back to the batch dispatcher
+
+    @property
+    def cancelled(self) -> bool:
+        return self.offer is None and self.pickup is None
+
+    @property
+    def outcome(self) -> str:
+        """reassigned, requeued (waiting for a dispatch round) or cancelled."""
+        if self.offer is not None:
+            return "reassigned"
+        return "requeued" if self.pickup is not None else "cancelled"
+
+
+def offer_ride(ride: Ride, driver: IndexedDriver) -> None:
+    """Assign a ride to a driver with a fresh response deadline (not committed)."""
+    ride.assigned_driver_id = driver.driver_id
+    ride.driver_id = driver.user_id
+    ride.driver_response_deadline = datetime.utcnow() + timedelta(seconds=settings.RIDE_OFFER_TIMEOUT_SECONDS)
+
+
+def build_offer(ride: Ride) -> RideOffer:
+    """Snapshot an offered ride while its attributes are still loaded (before commit)."""
+    payload = RideResponse.model_validate(ride).model_dump(mode="json")
+    payload["driver_response_deadline"] = ride.driver_response_deadline.isoformat()
+    return RideOffer(
+        ride_id=ride.id,
+        driver_id=ride.assigned_driver_id,
+        deadline=ride.driver_response_deadline,
+        ride=payload
+    )
+
+
+def announce_offer(offer: RideOffer) -> None:
+    """After commit: arm the expiry timer, push the offer to the driver and wake the rider."""
+    schedule_offer_expiry(offer.ride_id, offer.deadline)
+    driver_hub.push(offer.driver_id, {"type": "ride_offer", "ride": offer.ride})
+    ride_events.publish(offer.ride_id)
+
+
+def withdraw_offer(ride_id: UUID, driver_id: Optional[UUID]) -> None:
+    """Tell a driver that an offer it holds is no longer valid."""
+    if driver_id is not None:
+        driver_hub.push(driver_id, {"type": "offer_withdrawn", "ride_id": str(ride_id)})
+
+
+def schedule_offer_expiry(ride_id: UUID, deadline: datetime) -> None:
+    """Arm the timer that fires when the driver fails to answer in time."""
+    when = deadline.replace(tzinfo=timezone.utc).timestamp()
+    timer_wheel.schedule(ride_id, when, partial(expire_ride_offer, ride_id))
+
+
+def cancel_offer_expiry(ride_id: UUID) -> None:
+    timer_wheel.cancel(ride_id)
+
+
+def prepare_reassignment(ride: Ride, previous_driver_id: Optional[UUID]) -> Reassignment:
+    """
+    Move a pending ride on from a driver who rejected or missed it (not committed).
+
+    With the batched dispatcher on, the ride is unassigned and goes back to
+    its queue, which skips drivers holding other offers. Otherwise it is
+    offered to the next nearest driver, or cancelled if there is none.
+
+    Args:
+        ride: Pending ride whose current offer was rejected or expired
+        previous_driver_id: Driver that must not get the ride again
+    """
+    from app.core.dispatcher import ride_dispatcher
+
+    reassignment = Reassignment(ride_id=ride.id, previous_driver_id=previous_driver_id)
+    if ride_dispatcher.enabled:
+        ride.assigned_driver_id = None
+        ride.driver_id = None
+        ride.driver_response_deadline = None
+        reassignment.pickup = (ride.pickup_lat, ride.pickup_lng)
+        return reassignment
+
+    exclude = {previous_driver_id} if previous_driver_id else set()
+    candidates = driver_index.nearest(ride.pickup_lat, ride.pickup_lng, k=1, exclude=exclude)
+
+    if candidates:
+        offer_ride(ride, candidates[0][0])
+        reassignment.offer = build_offer(ride)
+        return reassignment
+
+    # No drivers available, cancel ride
+    ride.status = RideStatus.CANCELLED
+    return reassignment
+
+
+def finish_reassignment(reassignment: Reassignment) -> None:
+    """After commit: notify drivers and the rider about a prepared reassignment."""
+    from app.core.dispatcher import ride_dispatcher
+
+    withdraw_offer(reassignment.ride_id, reassignment.previous_driver_id)
+    if reassignment.offer is not None:
+        announce_offer(reassignment.offer)
+        return
+
+    cancel_offer_expiry(reassignment.ride_id)
+    ride_events.publish(reassignment.ride_id)
+    if reassignment.pickup is not None:
+        exclude = {reassignment.previous_driver_id} if reassignment.previous_driver_id else None
+        ride_dispatcher.submit(reassignment.ride_id, *reassignment.pickup, exclude=exclude)
+    else:
+        RIDES_CANCELLED.inc()
+
+
+def reassign_or_cancel(db, ride: Ride, previous_driver_id: Optional[UUID]) -> bool:
+    """
+    Reassign or cancel a ride and commit.
+
+    Returns:
+        True if the ride was reassigned or requeued, False if it was cancelled
+    """
+    reassignment = prepare_reassignment(ride, previous_driver_id)
+    db.commit()
+    finish_reassignment(reassignment)
+    return not reassignment.cancelled
+
+
+def expire_ride_offer(ride_id: UUID) -> None:
+    """Timer callback: move an unanswered offer on to the next driver."""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        ride = db.query(Ride).filter(Ride.id == ride_id).with_for_update().first()
+        if (
+            ride is None
+            or ride.status != RideStatus.PENDING
+            or ride.driver_response_deadline is None
+        ):
+            db.rollback()
+            return
+
+        if ride.driver_response_deadline > datetime.utcnow():
+            # Deadline was extended after this timer was armed
+            deadline = ride.driver_response_deadline
+            db.rollback()
+            schedule_offer_expiry(ride_id, deadline)
+            return
+
+        reassign_or_cancel(db, ride, ride.assigned_driver_id)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def recover_offer_deadlines(db) -> int:
+    """Re-arm timers for every outstanding offer. Returns the number of timers armed."""
+    rows = db.query(Ride.id, Ride.driver_response_deadline).filter(
+        Ride.status == RideStatus.PENDING,
+        Ride.driver_response_deadline.isnot(None)
+    ).all()
+    for ride_id, deadline in rows:
+        schedule_offer_expiry(ride_id, deadline)
+    return len(rows)
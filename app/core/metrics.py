@@ -0,0 +1,128 @@
+# Prometheus metrics served at /metrics
+import os
+import time
+
+import anyio.to_thread
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# With several workers, every process writes its samples to files in this
+# directory and /metrics adds them up. It must be empty when the server starts.
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Requests
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+THREADPOOL_BUSY = Gauge(
+    "threadpool_busy_threads",
+    "Threads running sync endpoints and jobs, sampled at each request",
+    multiprocess_mode="livesum"
+)
+THREADPOOL_SIZE = Gauge(
+    "threadpool_threads",
+    "Thread limit for sync endpoints and jobs",
+    multiprocess_mode="livesum"
+)
+
+# Database connection pools
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections in use",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections open beyond the pool size",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time to get a connection from a pool",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+
+# Rides and drivers
+RIDES_REQUESTED = Counter("rides_requested_total", "Rides requested")
+RIDES_MATCHED = Counter("rides_matched_total", "Rides accepted by a driver")
+RIDES_CANCELLED = Counter("rides_cancelled_total", "Rides cancelled because no driver was left to offer them to")
+TIME_TO_MATCH = Histogram(
+    "ride_time_to_match_seconds",
+    "Time from ride request to driver acceptance",
+    buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+)
+LOCATION_UPDATES = Counter("driver_location_updates_total", "Driver location pings (HTTP and WebSocket)")
+
+
+class _TimedCheckout:
+    """Pool mixin recording how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_pool(engine: Engine, name: str) -> None:
+    """Keep the pool gauges of `engine` (pass `.sync_engine` of an async engine) current."""
+
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+    overflow = DB_POOL_OVERFLOW.labels(name)
+
+    def update_gauges(in_use: int) -> None:
+        checked_out.set(in_use)
+        overflow.set(max(0, in_use - engine.pool.size()))
+
+    def on_checkout(*args):
+        update_gauges(engine.pool.checkedout())
+
+    def on_checkin(*args):
+        # Fires before the pool takes the connection back
+        update_gauges(engine.pool.checkedout() - 1)
+
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+
+
+def sample_threadpool() -> None:
+    """Record threadpool use; call from the event loop."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+
+
+def render_metrics() -> bytes:
+    """Metrics in the Prometheus text format, summed over all workers in multiprocess mode."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_stopped() -> None:
+    """Drop this worker's live gauges from the multiprocess totals."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,140 @@
+# Argon2 hashing off the request threads
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Optional, Tuple
+
+from app.config import settings
+from app.core.security import get_password_hash, verify_and_update_password
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool already has PASSWORD_POOL_MAX_PENDING jobs."""
+
+
+class LatencyWindow:
+    """Durations of the last `size` operations, for percentile reporting."""
+
+    def __init__(self, size: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> dict:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"count": self.count}
+
+        def percentile(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+        return {
+            "count": self.count,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1] * 1000, 1),
+        }
+
+
+class PasswordPool:
+    """
+    Runs Argon2 hashing and verification in worker processes.
+
+    Argon2 is CPU and memory heavy on purpose; running it in the API process
+    ties up the threadpool and the GIL for every other request. Jobs go to a
+    ProcessPoolExecutor of PASSWORD_POOL_WORKERS processes, and once
+    PASSWORD_POOL_MAX_PENDING jobs are queued or running new ones are refused
+    with PasswordPoolBusy instead of waiting.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._rejected = 0
+        self._latencies: Dict[str, LatencyWindow] = {
+            "hash": LatencyWindow(),
+            "verify": LatencyWindow(),
+            "login": LatencyWindow(),
+        }
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is None:
+                # Fresh interpreters: workers must not inherit the event loop or DB connections
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, operation: str, fn, *args) -> Future:
+        self.start()
+        with self._lock:
+            if self._pending >= settings.PASSWORD_POOL_MAX_PENDING:
+                self._rejected += 1
+                raise PasswordPoolBusy()
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def done(_future: Future) -> None:
+            with self._lock:
+                self._pending -= 1
+            self._latencies[operation].record(time.perf_counter() - submitted)
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(done)
+        return future
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit("hash", get_password_hash, password))
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password against its stored hash.
+
+        Returns:
+            (verified, new_hash); new_hash is set when the stored hash uses
+            outdated parameters and should be replaced
+        """
+        return await asyncio.wrap_future(
+            self._submit("verify", verify_and_update_password, password, password_hash)
+        )
+
+    def hash_sync(self, password: str) -> str:
+        """Blocking variant for sync endpoints; the work still runs in the pool."""
+        return self._submit("hash", get_password_hash, password).result()
+
+    def record_login(self, seconds: float) -> None:
+        """Record the end-to-end duration of a login request."""
+        self._latencies["login"].record(seconds)
+
+    def stats(self) -> dict:
+        return {
+            "workers": settings.PASSWORD_POOL_WORKERS,
+            "max_pending": settings.PASSWORD_POOL_MAX_PENDING,
+            "pending": self._pending,
+            "rejected": self._rejected,
+            "latency": {operation: window.summary() for operation, window in self._latencies.items()},
+        }
+
+
+# Process-wide pool shared by all requests
+password_pool = PasswordPool()
@@ -1,42 +1,201 @@
-def calculate_ride_price(distance_km: float) -> float:
+# Table-driven fare calculation
+import asyncio
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models import DriverType, PricingRate, VehicleType
+from app.utils.cache import TTLCache
+from app.utils.location import calculate_distance
+
+
+@dataclass(frozen=True)
+class Rate:
+    base_fare: float
+    per_km: float
+    minimum_fare: float = 0
+
+    def price(self, distance_km: float) -> float:
+        return max(self.minimum_fare, self.base_fare + self.per_km * distance_km)
+
+
+@dataclass(frozen=True)
+class Quote:
+    distance_km: float
+    price: float
+
+
+RateKey = Tuple[DriverType, Optional[VehicleType]]
+
+# Built-in rates; rows in pricing_rates override or extend them
+DEFAULT_RATES: Dict[RateKey, Rate] = {
+    (DriverType.TAXI, None): Rate(base_fare=5000, per_km=2000),
+    (DriverType.DELIVERY, None): Rate(base_fare=0, per_km=5000, minimum_fare=10000),
+}
+
+
+class PricingEngine:
     """
-    Calculate ride price based on distance.
-    
-    Args:
-        distance_km: Distance in kilometers
-        
-    Returns:
-        Price in SYP
+    Prices rides and deliveries from one rate table.
+
+    Rates are keyed by service and vehicle type, with a per-service fallback
+    for vehicles that have no rate of their own, and are reloaded from the
+    database every PRICING_RELOAD_SECONDS. Quotes are cached per pair of
+    pickup/destination cells (PRICING_QUOTE_CELL_DEGREES) in a bounded LRU
+    with a TTL; a rate change clears the cache.
     """
-    BASE_PRICE = 10000  # SYP
-    PRICE_PER_KM = 5000  # SYP
-    
-    return max(BASE_PRICE, distance_km * PRICE_PER_KM)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates: Dict[RateKey, Rate] = dict(DEFAULT_RATES)
+        self._quotes = TTLCache(settings.PRICING_QUOTE_CACHE_SIZE, settings.PRICING_QUOTE_TTL_SECONDS)
+        self._loaded_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def rate_for(self, driver_type: DriverType, vehicle_type: Optional[VehicleType] = None) -> Rate:
+        rates = self._rates
+        return rates.get((driver_type, vehicle_type)) or rates[(driver_type, None)]
+
+    def price(self, driver_type: DriverType, distance_km: float, vehicle_type: Optional[VehicleType] = None) -> float:
+        """Fare for a known distance (e.g. a metered trip)."""
+        return self.rate_for(driver_type, vehicle_type).price(distance_km)
+
+    def quote(
+        self,
+        driver_type: DriverType,
+        pickup_lat: float,
+        pickup_lng: float,
+        destination_lat: float,
+        destination_lng: float,
+        vehicle_type: Optional[VehicleType] = None
+    ) -> Quote:
+        """
+        Estimated distance and fare of a trip.
+
+        Args:
+            driver_type: Service the trip is for
+            pickup_lat, pickup_lng: Pickup coordinate
+            destination_lat, destination_lng: Destination coordinate
+            vehicle_type: Vehicle to price for, if known
+
+        Returns:
+            Quote for the trip between the centres of the two cells, so every
+            request for the same trip gets the same answer
+        """
+        cell = settings.PRICING_QUOTE_CELL_DEGREES
+        key = (
+            driver_type,
+            vehicle_type,
+            round(pickup_lat / cell),
+            round(pickup_lng / cell),
+            round(destination_lat / cell),
+            round(destination_lng / cell),
+        )
+        cached = self._quotes.get(key)
+        if cached is not None:
+            return cached
+
+        distance_km = calculate_distance(key[2] * cell, key[3] * cell, key[4] * cell, key[5] * cell)
+        quote = Quote(distance_km=distance_km, price=self.price(driver_type, distance_km, vehicle_type))
+        self._quotes.put(key, quote)
+        return quote
+
+    def reload(self, db) -> int:
+        """Load the rate table from the database. Returns the number of stored rates."""
+        rows = db.query(PricingRate).all()
+        rates = dict(DEFAULT_RATES)
+        for row in rows:
+            rates[(row.driver_type, row.vehicle_type)] = Rate(
+                base_fare=row.base_fare,
+                per_km=row.per_km,
+                minimum_fare=row.minimum_fare
+            )
+        with self._lock:
+            if rates != self._rates:
+                self._rates = rates
+                self._quotes.clear()
+            self._loaded_at = datetime.utcnow()
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "rates": [
+                {
+                    "driver_type": driver_type.value,
+                    "vehicle_type": vehicle_type.value if vehicle_type else None,
+                    "base_fare": rate.base_fare,
+                    "per_km": rate.per_km,
+                    "minimum_fare": rate.minimum_fare,
+                }
+                for (driver_type, vehicle_type), rate in self._rates.items()
+            ],
+            "loaded_at": self._loaded_at.isoformat() if self._loaded_at else None,
+            "cached_quotes": len(self._quotes),
+            "cache_hits": self._quotes.hits,
+            "cache_misses": self._quotes.misses,
+        }
+
+    async def run(self) -> None:
+        """Reload loop, picks up rate changes made by other processes."""
+        from app.database import SessionLocal
+
+        def tick():
+            db = SessionLocal()
+            try:
+                self.reload(db)
+            except Exception as e:
+                print(f"❌ Pricing reload error: {str(e)}")
+            finally:
+                db.close()
+
+        while True:
+            await asyncio.sleep(settings.PRICING_RELOAD_SECONDS)
+            await run_in_threadpool(tick)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
 
 
 def calculate_delivery_price(
-    distance_km: float,
+    delivery_fee: float,
     driver_pays: bool = False,
     product_amount: float = 0
 ) -> dict:
     """
-    Calculate delivery price including delivery fee and optional product amount.
-    
+    Calculate delivery total including the optional product amount.
+
     Args:
-        distance_km: Distance in kilometers
+        delivery_fee: Delivery fee in SYP, from the pricing engine
         driver_pays: Whether driver pays for the product
         product_amount: Product amount in SYP
-        
+
     Returns:
         Dictionary with delivery_fee and total_cost
     """
-    delivery_fee = calculate_ride_price(distance_km)
     total_cost = delivery_fee
-    
+
     if driver_pays and product_amount > 0:
         total_cost += product_amount
-    
+
     return {
         "delivery_fee": delivery_fee,
         "total_cost": total_cost
     }
+
+
+# Process-wide engine shared by all requests
+pricing_engine = PricingEngine()
@@ -0,0 +1,20 @@
+# Cache of authenticated users
+from uuid import UUID
+from typing import Union
+
+from app.config import settings
+from app.utils.cache import TTLCache
+
+# Detached User rows keyed by the JWT subject. Handlers only read them;
+# anything that changes a user must reload it in its own session and call
+# invalidate_principal afterwards.
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Driver profile id of each user with one, for hot paths that need no other driver column
+driver_id_cache = TTLCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def invalidate_principal(user_id: Union[UUID, str]) -> None:
+    """Drop a user (and its driver id) from the caches so the next request reloads it."""
+    principal_cache.pop(str(user_id))
+    driver_id_cache.pop(str(user_id))
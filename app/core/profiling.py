@@ -0,0 +1,205 @@
+# Request profiles: on demand for admins, and sampled slowest-per-route
+import asyncio
+import functools
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+from pyinstrument.session import Session
+
+from app.config import settings
+
+# Request header asking for a profile (honoured for admins only)
+PROFILE_HEADER = "X-Profile"
+
+# Response header naming the stored profile
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# On-demand profiles kept; the oldest is dropped first
+MAX_REQUESTED_PROFILES = 50
+
+
+# Profiles taken in worker threads for the request being profiled; None when it is not
+_thread_sessions: ContextVar[Optional[List[Session]]] = ContextVar("profiled_thread_sessions", default=None)
+
+
+class RequestProfiler:
+    """
+    Sampling profiler for one request.
+
+    pyinstrument samples only the thread it was started on, so sync endpoints,
+    which run in the threadpool, are profiled separately by ProfiledRoute and
+    merged in when the request's profiler stops.
+    """
+
+    def __init__(self):
+        self._profiler = Profiler(interval=settings.PROFILE_INTERVAL_MS / 1000, async_mode="enabled")
+        self._thread_sessions: List[Session] = []
+
+    def start(self) -> None:
+        # Set, not reset on stop: the request's context ends with it, and
+        # stop() may run from another task (e.g. a streaming response)
+        _thread_sessions.set(self._thread_sessions)
+        self._profiler.start()
+
+    def stop(self) -> Session:
+        session = self._profiler.stop()
+        duration = session.duration
+        for thread_session in self._thread_sessions:
+            session = Session.combine(session, thread_session)
+        # The threads ran while the event loop awaited them; keep the wall time
+        session.duration = duration
+        return session
+
+
+def start_profiler() -> RequestProfiler:
+    """
+    Start a sampling profiler for the current request.
+
+    In async mode only the request's own context is sampled; time spent
+    while other requests run on the event loop shows up as awaiting.
+    """
+    profiler = RequestProfiler()
+    profiler.start()
+    return profiler
+
+
+def profile_in_thread(endpoint: Callable) -> Callable:
+    """Wrap a sync endpoint so it is profiled in the worker thread when its request is."""
+
+    @functools.wraps(endpoint)
+    def run(*args, **kwargs):
+        sessions = _thread_sessions.get()
+        if sessions is None:
+            return endpoint(*args, **kwargs)
+        profiler = Profiler(interval=settings.PROFILE_INTERVAL_MS / 1000, async_mode="disabled")
+        profiler.start()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            sessions.append(profiler.stop())
+
+    return run
+
+
+class ProfiledRoute(APIRoute):
+    """Route class profiling sync endpoints in their worker thread (use as APIRouter(route_class=...))."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = profile_in_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+@dataclass
+class RequestProfile:
+    """One profiled request."""
+
+    method: str
+    path: str
+    route: str
+    status_code: int
+    duration_ms: float
+    sampled: bool
+    session: Session = field(repr=False)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    captured_at: datetime = field(default_factory=datetime.utcnow)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status_code": self.status_code,
+            "duration_ms": round(self.duration_ms, 1),
+            "sampled": self.sampled,
+            "captured_at": self.captured_at.isoformat(),
+        }
+
+    def speedscope(self) -> str:
+        """Profile in speedscope's JSON format (a flamegraph viewer: https://www.speedscope.app)."""
+        return SpeedscopeRenderer().render(self.session)
+
+
+class ProfileStore:
+    """
+    Request profiles kept in memory.
+
+    Profiles asked for with the X-Profile header are kept until
+    MAX_REQUESTED_PROFILES newer ones arrive. Besides those, a fraction
+    PROFILE_SAMPLE_RATE of all requests is profiled, at most
+    PROFILE_SAMPLES_PER_MINUTE of them, and only the PROFILE_KEEP_SLOWEST
+    slowest of each route are kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requested: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._slowest: Dict[str, List[RequestProfile]] = {}
+        self._window_start = 0.0
+        self._window_samples = 0
+
+    def should_sample(self) -> bool:
+        """Decide whether to profile a request that did not ask for it."""
+        if settings.PROFILE_SAMPLE_RATE <= 0 or random.random() >= settings.PROFILE_SAMPLE_RATE:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._window_start >= 60:
+                self._window_start = now
+                self._window_samples = 0
+            if self._window_samples >= settings.PROFILE_SAMPLES_PER_MINUTE:
+                return False
+            self._window_samples += 1
+            return True
+
+    def add(self, profile: RequestProfile) -> bool:
+        """Store a profile. Returns False if a sampled one was not among its route's slowest."""
+        with self._lock:
+            if not profile.sampled:
+                self._requested[profile.id] = profile
+                while len(self._requested) > MAX_REQUESTED_PROFILES:
+                    self._requested.popitem(last=False)
+                return True
+
+            slowest = self._slowest.setdefault(profile.route, [])
+            if len(slowest) >= settings.PROFILE_KEEP_SLOWEST and profile.duration_ms <= slowest[-1].duration_ms:
+                return False
+            slowest.append(profile)
+            slowest.sort(key=lambda kept: kept.duration_ms, reverse=True)
+            del slowest[settings.PROFILE_KEEP_SLOWEST:]
+            return True
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            if profile_id in self._requested:
+                return self._requested[profile_id]
+            for slowest in self._slowest.values():
+                for profile in slowest:
+                    if profile.id == profile_id:
+                        return profile
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requested": [profile.summary() for profile in reversed(self._requested.values())],
+                "slowest_by_route": {
+                    route: [profile.summary() for profile in slowest]
+                    for route, slowest in sorted(self._slowest.items())
+                },
+            }
+
+
+# Process-wide profile store
+request_profiles = ProfileStore()
@@ -0,0 +1,117 @@
+# Per-request SQL query counting and slow query log
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+# Longest statement text printed by the slow query log
+MAX_LOGGED_STATEMENT = 1000
+
+_SERVER_TIMING_QUERIES = re.compile(r'\bdb;desc="(\d+) queries"')
+
+
+class QueryStats:
+    """Queries run on behalf of one request (or one counted block of code)."""
+
+    __slots__ = ("count", "seconds", "label", "_scope")
+
+    def __init__(self, label: str = "", scope: Optional[dict] = None):
+        self.count = 0
+        self.seconds = 0.0
+        self.label = label
+        self._scope = scope
+
+    @property
+    def route(self) -> str:
+        """Route template once routing has matched (e.g. /api/v1/rides/{ride_id}/status), else the label."""
+        route = self._scope.get("route") if self._scope is not None else None
+        return getattr(route, "path", None) or self.label
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. `db;desc="3 queries";dur=4.2`."""
+        return f'db;desc="{self.count} queries";dur={self.seconds * 1000:.1f}'
+
+
+# Stats of the request being handled; None outside requests (background workers)
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        route = stats.route if stats is not None else "background"
+        sql = " ".join(statement.split())[:MAX_LOGGED_STATEMENT]
+        print(f"⚠️ Slow query ({elapsed * 1000:.0f} ms) in {route}: {sql}")
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time every statement run through `engine` (pass `.sync_engine` of an async engine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def count_queries(label: str = "") -> Iterator[QueryStats]:
+    """
+    Count the queries run inside the block, in this context.
+
+    Usage:
+        with count_queries() as stats:
+            load_driver_index(db)
+        assert stats.count <= 2
+    """
+    stats = QueryStats(label)
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+
+def query_count(response) -> int:
+    """
+    Number of queries a response reports in its Server-Timing header.
+
+    Raises:
+        ValueError: If the response carries no query count
+    """
+    match = _SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+    if match is None:
+        raise ValueError("Response has no Server-Timing query count")
+    return int(match.group(1))
+
+
+def assert_max_queries(response, limit: int) -> None:
+    """
+    Fail when an endpoint ran more than `limit` queries, so N+1 regressions break the build.
+
+    Usage (with fastapi.testclient.TestClient):
+        assert_max_queries(client.get("/api/v1/deliveries", headers=auth), 2)
+    """
+    count = query_count(response)
+    assert count <= limit, (
+        f"{response.request.method} {response.request.url.path} ran {count} queries, expected at most {limit}"
+    )
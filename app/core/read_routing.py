@@ -0,0 +1,52 @@
+# Read-your-writes guard for replica reads
+from typing import Optional
+
+from app.config import settings
+from app.core.security import decode_access_token
+from app.database import REPLICA_URLS
+from app.utils.cache import TTLCache
+
+# Users tracked at once; an evicted user only loses the guard early
+MAX_TRACKED_WRITERS = 100000
+
+# Request methods that never change data
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class RecentWrites:
+    """
+    Users who changed data within the last REPLICA_STALENESS_SECONDS.
+
+    Replicas lag the primary slightly, so a user reading right after their
+    own write could miss it. Their reads go to the primary until the window
+    passes; everyone else reads from the replicas.
+    
+    Kept in process memory: other workers and instances do not see the
+    writes recorded here (see get_read_db).
+    """
+
+    def __init__(self):
+        self._users = TTLCache(MAX_TRACKED_WRITERS, settings.REPLICA_STALENESS_SECONDS)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(REPLICA_URLS)
+
+    def mark(self, user_id: str) -> None:
+        self._users.put(user_id, True)
+
+    def mark_token(self, authorization: Optional[str]) -> None:
+        """Mark the user behind an Authorization header, if it carries a valid token."""
+        if not authorization or not authorization.lower().startswith("bearer "):
+            return
+        payload = decode_access_token(authorization[7:])
+        if payload and payload.get("sub"):
+            self.mark(payload["sub"])
+
+    def recent(self, user_id: str) -> bool:
+        """Check if the user wrote recently enough that replicas may not have it yet."""
+        return self.enabled and self._users.get(user_id) is not None
+
+
+# Process-wide tracker shared by all requests
+recent_writes = RecentWrites()
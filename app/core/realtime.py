@@ -0,0 +1,93 @@
+# WebSocket fan-out to connected drivers
+import asyncio
+import threading
+from typing import Dict, Optional
+from uuid import UUID
+
+from fastapi import WebSocket
+
+from app.config import settings
+
+
+class DriverConnection:
+    """One authenticated driver socket with a bounded outgoing queue."""
+
+    def __init__(self, websocket: WebSocket, driver_id: UUID, user_id: UUID):
+        self.websocket = websocket
+        self.driver_id = driver_id
+        self.user_id = user_id
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.DRIVER_WS_SEND_QUEUE_SIZE)
+        self.closed = asyncio.Event()
+
+    def send(self, message: dict) -> bool:
+        """
+        Queue a message without blocking.
+
+        A driver that cannot keep up with its queue is disconnected rather
+        than buffered without bound; the app falls back to polling and
+        reconnects.
+        """
+        if self.closed.is_set():
+            return False
+        try:
+            self.outbox.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.closed.set()
+            return False
+
+
+class DriverHub:
+    """
+    Registry of open driver sockets.
+
+    `push` may be called from worker threads (sync endpoints, timers);
+    delivery is always handed over to the event loop that owns the sockets.
+    """
+
+    def __init__(self):
+        self._connections: Dict[UUID, DriverConnection] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def is_connected(self, driver_id: UUID) -> bool:
+        return driver_id in self._connections
+
+    def register(self, connection: DriverConnection) -> None:
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            previous = self._connections.get(connection.driver_id)
+            self._connections[connection.driver_id] = connection
+        if previous is not None:
+            # Only the newest socket of a driver stays open
+            previous.closed.set()
+
+    def unregister(self, connection: DriverConnection) -> None:
+        with self._lock:
+            if self._connections.get(connection.driver_id) is connection:
+                del self._connections[connection.driver_id]
+
+    def push(self, driver_id: UUID, message: dict) -> None:
+        """Send a message to a driver if it has an open socket."""
+        if driver_id not in self._connections or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(driver_id, message)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, driver_id, message)
+
+    def _deliver(self, driver_id: UUID, message: dict) -> None:
+        connection = self._connections.get(driver_id)
+        if connection is not None:
+            connection.send(message)
+
+
+# Process-wide hub shared by all requests
+driver_hub = DriverHub()
@@ -0,0 +1,61 @@
+# In-process ride change notifications
+import asyncio
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+
+class RideEvents:
+    """
+    Wakes requests waiting on a ride when one of its handlers changes it.
+
+    Waiters live on the event loop; `publish` may be called from worker
+    threads and hands the wake-up over to the loop. A waiter subscribes
+    before reading the ride so a change between the read and the wait is
+    never missed.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[UUID, Set[asyncio.Event]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, ride_id: UUID) -> asyncio.Event:
+        self._loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        self._waiters.setdefault(ride_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, ride_id: UUID, event: asyncio.Event) -> None:
+        waiters = self._waiters.get(ride_id)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del self._waiters[ride_id]
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        """Wait for a change. Returns False on timeout."""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def publish(self, ride_id: UUID) -> None:
+        """Signal that a ride's status or driver changed (call after commit)."""
+        if ride_id not in self._waiters or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wake(ride_id)
+        else:
+            self._loop.call_soon_threadsafe(self._wake, ride_id)
+
+    def _wake(self, ride_id: UUID) -> None:
+        for event in self._waiters.get(ride_id, ()):
+            event.set()
+
+
+# Process-wide notifier shared by all requests
+ride_events = RideEvents()
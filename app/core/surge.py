@@ -0,0 +1,213 @@
+# Zone surge multipliers from live supply and demand
+import asyncio
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from app.config import settings
+from app.models import Driver, DriverLiveState, DriverOnlineStatus, DriverStatus, DriverType
+
+ZoneKey = Tuple[DriverType, int, int]
+
+
+def zone_of(driver_type: DriverType, lat: float, lng: float) -> ZoneKey:
+    size = settings.SURGE_ZONE_DEGREES
+    return (driver_type, math.floor(lat / size), math.floor(lng / size))
+
+
+def is_supply(driver: Driver, live: DriverLiveState) -> bool:
+    """Check if a driver counts towards the supply of its zone."""
+    return driver.status == DriverStatus.APPROVED and live.online_status == DriverOnlineStatus.ONLINE
+
+
+class SurgeMonitor:
+    """
+    Per-zone supply/demand counters and the surge multipliers derived from them.
+
+    Supply is the number of online drivers in a zone, kept up to date as
+    drivers change status or move. Demand is an exponentially decaying count
+    of requests with a time constant of SURGE_WINDOW_SECONDS, updated in O(1)
+    per request. Multipliers are recomputed every SURGE_RECOMPUTE_SECONDS,
+    so pricing a request is a single dictionary lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._drivers: Dict[UUID, ZoneKey] = {}
+        self._awaiting_location: Dict[UUID, DriverType] = {}
+        self._supply: Dict[ZoneKey, int] = {}
+        self._demand: Dict[ZoneKey, List[float]] = {}  # zone -> [decayed count, monotonic time]
+        self._multipliers: Dict[ZoneKey, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def sync(self, driver: Driver, live: DriverLiveState) -> None:
+        """Count or stop counting a driver depending on its status (see DriverIndex.sync)."""
+        with self._lock:
+            self._remove_locked(driver.id)
+            if not is_supply(driver, live):
+                return
+            if live.current_location_lat is None or live.current_location_lng is None:
+                self._awaiting_location[driver.id] = driver.driver_type
+            else:
+                self._place_locked(
+                    driver.id,
+                    zone_of(driver.driver_type, live.current_location_lat, live.current_location_lng)
+                )
+
+    def move(self, driver_id: UUID, lat: float, lng: float) -> None:
+        """Follow a counted driver into another zone."""
+        with self._lock:
+            zone = self._drivers.get(driver_id)
+            if zone is not None:
+                driver_type = zone[0]
+            else:
+                driver_type = self._awaiting_location.pop(driver_id, None)
+                if driver_type is None:
+                    return
+            new_zone = zone_of(driver_type, lat, lng)
+            if new_zone != zone:
+                self._remove_locked(driver_id)
+                self._place_locked(driver_id, new_zone)
+
+    def remove(self, driver_id: UUID) -> None:
+        with self._lock:
+            self._remove_locked(driver_id)
+
+    def load(self, drivers: Iterable[Tuple[UUID, DriverType, Optional[float], Optional[float]]]) -> None:
+        """Replace all supply counters with (driver_id, driver_type, lat, lng) rows."""
+        with self._lock:
+            self._drivers.clear()
+            self._awaiting_location.clear()
+            self._supply.clear()
+            for driver_id, driver_type, lat, lng in drivers:
+                if lat is None or lng is None:
+                    self._awaiting_location[driver_id] = driver_type
+                else:
+                    self._place_locked(driver_id, zone_of(driver_type, lat, lng))
+
+    def record_request(self, driver_type: DriverType, lat: float, lng: float) -> float:
+        """Count a request towards the demand of its zone. Returns the zone's current multiplier."""
+        zone = zone_of(driver_type, lat, lng)
+        now = time.monotonic()
+        with self._lock:
+            demand = self._demand.get(zone)
+            if demand is None:
+                self._demand[zone] = [1.0, now]
+            else:
+                demand[0] = self._decayed(demand, now) + 1
+                demand[1] = now
+            return self._multipliers.get(zone, 1.0)
+
+    def multiplier(self, driver_type: DriverType, lat: float, lng: float) -> float:
+        return self._multipliers.get(zone_of(driver_type, lat, lng), 1.0)
+
+    def recompute(self) -> int:
+        """Refresh every zone's multiplier. Returns the number of zones surging."""
+        now = time.monotonic()
+        multipliers: Dict[ZoneKey, float] = {}
+        with self._lock:
+            for zone, demand in list(self._demand.items()):
+                count = self._decayed(demand, now)
+                if count < 0.05:
+                    # Demand has died down; forget the zone
+                    del self._demand[zone]
+                    continue
+                multiplier = self._surge(count, self._supply.get(zone, 0))
+                if multiplier > 1.0:
+                    multipliers[zone] = multiplier
+            self._multipliers = multipliers
+        return len(multipliers)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            zones = set(self._demand) | set(self._supply)
+            rows = [
+                {
+                    "driver_type": zone[0].value,
+                    "lat": zone[1] * settings.SURGE_ZONE_DEGREES,
+                    "lng": zone[2] * settings.SURGE_ZONE_DEGREES,
+                    "online_drivers": self._supply.get(zone, 0),
+                    "recent_requests": round(self._decayed(self._demand[zone], now), 2) if zone in self._demand else 0.0,
+                    "multiplier": self._multipliers.get(zone, 1.0),
+                }
+                for zone in zones
+            ]
+        rows.sort(key=lambda row: (-row["multiplier"], -row["recent_requests"]))
+        return {
+            "zone_degrees": settings.SURGE_ZONE_DEGREES,
+            "window_seconds": settings.SURGE_WINDOW_SECONDS,
+            "zones": rows,
+        }
+
+    @staticmethod
+    def _decayed(demand: List[float], now: float) -> float:
+        return demand[0] * math.exp(-(now - demand[1]) / settings.SURGE_WINDOW_SECONDS)
+
+    @staticmethod
+    def _surge(requests: float, drivers: int) -> float:
+        pressure = requests / max(drivers, 1)
+        if pressure <= 1:
+            return 1.0
+        multiplier = 1 + settings.SURGE_SENSITIVITY * (pressure - 1)
+        return round(min(settings.SURGE_MAX_MULTIPLIER, multiplier), 1)
+
+    def _place_locked(self, driver_id: UUID, zone: ZoneKey) -> None:
+        self._drivers[driver_id] = zone
+        self._supply[zone] = self._supply.get(zone, 0) + 1
+
+    def _remove_locked(self, driver_id: UUID) -> None:
+        self._awaiting_location.pop(driver_id, None)
+        zone = self._drivers.pop(driver_id, None)
+        if zone is not None:
+            remaining = self._supply[zone] - 1
+            if remaining:
+                self._supply[zone] = remaining
+            else:
+                del self._supply[zone]
+
+    async def run(self) -> None:
+        """Recompute multipliers every SURGE_RECOMPUTE_SECONDS."""
+        while True:
+            await asyncio.sleep(settings.SURGE_RECOMPUTE_SECONDS)
+            try:
+                self.recompute()
+            except Exception as e:
+                print(f"❌ Surge recompute error: {str(e)}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def load_surge_supply(db) -> int:
+    """Populate supply counters from the driver tables. Returns the number of online drivers."""
+    rows = db.query(
+        Driver.id,
+        Driver.driver_type,
+        DriverLiveState.current_location_lat,
+        DriverLiveState.current_location_lng
+    ).join(
+        DriverLiveState, DriverLiveState.driver_id == Driver.id
+    ).filter(
+        DriverLiveState.online_status == DriverOnlineStatus.ONLINE,
+        Driver.status == DriverStatus.APPROVED
+    ).all()
+
+    surge_monitor.load((row[0], row[1], row[2], row[3]) for row in rows)
+    return len(rows)
+
+
+# Process-wide monitor shared by all requests
+surge_monitor = SurgeMonitor()
@@ -0,0 +1,141 @@
+# Hierarchical timer wheel
+import asyncio
+import math
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+TimerCallback = Callable[[], None]
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel for large numbers of one-shot timers.
+
+    Level 0 has one slot per tick; each higher level has one slot per full
+    turn of the level below. Scheduling and cancelling are O(1); a timer is
+    moved down one level at a time as its slot comes up, and fires on the
+    first tick at or after its deadline. Timers further out than the top
+    level can reach wait in an overflow bucket.
+    """
+
+    def __init__(self, tick_seconds: float = 0.1, slots: int = 64, levels: int = 3):
+        self._tick = tick_seconds
+        self._slots = slots
+        self._levels = levels
+        self._spans = [slots ** level for level in range(levels + 1)]
+        self._wheels: List[List[Dict[Hashable, Tuple[int, TimerCallback]]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._overflow: Dict[Hashable, Tuple[int, TimerCallback]] = {}
+        self._where: Dict[Hashable, Dict[Hashable, Tuple[int, TimerCallback]]] = {}
+        self._current = self._tick_of(time.time())
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def _tick_of(self, timestamp: float) -> int:
+        return math.floor(timestamp / self._tick)
+
+    def schedule(self, key: Hashable, when: float, callback: TimerCallback) -> None:
+        """
+        Schedule (or reschedule) a timer.
+
+        Args:
+            key: Timer identity; scheduling an existing key replaces it
+            when: Unix timestamp at which the timer fires
+            callback: Called without arguments in a worker thread
+        """
+        expires = math.ceil(when / self._tick)
+        with self._lock:
+            self._cancel_locked(key)
+            # Overdue timers fire on the next tick
+            self._place(key, max(expires, self._current + 1), callback)
+
+    def cancel(self, key: Hashable) -> None:
+        """Cancel a timer if it is still pending."""
+        with self._lock:
+            self._cancel_locked(key)
+
+    def advance(self, now: Optional[float] = None) -> List[TimerCallback]:
+        """Move the wheel up to `now` and return the callbacks that became due."""
+        target = self._tick_of(time.time() if now is None else now)
+        due: List[TimerCallback] = []
+        with self._lock:
+            while self._current < target:
+                self._current += 1
+                self._cascade()
+                slot = self._wheels[0][self._current % self._slots]
+                for key, (_, callback) in slot.items():
+                    del self._where[key]
+                    due.append(callback)
+                slot.clear()
+        return due
+
+    def _place(self, key: Hashable, expires: int, callback: TimerCallback) -> None:
+        delta = expires - self._current
+        bucket = self._overflow
+        for level in range(self._levels):
+            if delta < self._spans[level + 1]:
+                bucket = self._wheels[level][(expires // self._spans[level]) % self._slots]
+                break
+        bucket[key] = (expires, callback)
+        self._where[key] = bucket
+
+    def _cascade(self) -> None:
+        # Refill lower levels from the slots that just came due, top level first
+        if self._current % self._spans[self._levels - 1] == 0 and self._overflow:
+            pending = list(self._overflow.items())
+            self._overflow.clear()
+            for key, (expires, callback) in pending:
+                self._place(key, expires, callback)
+
+        for level in range(self._levels - 1, 0, -1):
+            if self._current % self._spans[level] != 0:
+                continue
+            slot = self._wheels[level][(self._current // self._spans[level]) % self._slots]
+            pending = list(slot.items())
+            slot.clear()
+            for key, (expires, callback) in pending:
+                self._place(key, expires, callback)
+
+    def _cancel_locked(self, key: Hashable) -> None:
+        bucket = self._where.pop(key, None)
+        if bucket is not None:
+            bucket.pop(key, None)
+
+    async def run(self) -> None:
+        """Advance the wheel every tick and run due callbacks in the threadpool."""
+        while True:
+            await asyncio.sleep(self._tick)
+            due = self.advance()
+            if not due:
+                continue
+            results = await asyncio.gather(
+                *(run_in_threadpool(callback) for callback in due),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"❌ Timer callback error: {str(result)}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Process-wide wheel for ride offer deadlines
+timer_wheel = TimerWheel()
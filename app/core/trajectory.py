@@ -0,0 +1,140 @@
+# GPS trajectories of rides in progress
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import UUID
+
+import numpy as np
+
+from app.config import settings
+from app.models import RideTrajectory
+from app.utils.location import haversine_km
+
+
+class Trajectory:
+    """
+    Location points of one ride in packed arrays.
+
+    Each point costs 12 bytes (float32 lat, float32 lng, int32 milliseconds
+    since the ride started). Pings closer than TRAJECTORY_MIN_STEP_METERS to
+    the previous point are skipped, and once TRAJECTORY_MAX_POINTS is reached
+    every other interior point is dropped, so a ride never grows past the cap.
+    The distance is summed as points arrive, so thinning never shortens it.
+    """
+
+    __slots__ = ("ride_id", "driver_id", "started_at", "_origin", "_distance_km", "lats", "lngs", "offsets_ms")
+
+    def __init__(self, ride_id: UUID, driver_id: UUID):
+        self.ride_id = ride_id
+        self.driver_id = driver_id
+        self.started_at = datetime.utcnow()
+        self._origin = time.monotonic()
+        self._distance_km = 0.0
+        self.lats = array("f")
+        self.lngs = array("f")
+        self.offsets_ms = array("i")
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def append(self, lat: float, lng: float) -> bool:
+        """Add a point. Returns False if it was too close to the previous one."""
+        step_km = 0.0
+        if self.lats:
+            step_km = haversine_km(self.lats[-1], self.lngs[-1], lat, lng)
+            if step_km * 1000 < settings.TRAJECTORY_MIN_STEP_METERS:
+                return False
+        self._distance_km += step_km
+        if len(self.lats) >= settings.TRAJECTORY_MAX_POINTS:
+            self._thin()
+        self.lats.append(lat)
+        self.lngs.append(lng)
+        self.offsets_ms.append(int((time.monotonic() - self._origin) * 1000))
+        return True
+
+    def _thin(self) -> None:
+        # Keep the first and last points so the path still spans the whole ride
+        for points in (self.lats, self.lngs, self.offsets_ms):
+            del points[1:-1:2]
+
+    def distance_km(self) -> float:
+        """Distance driven in kilometers, over every accepted point (thinned ones included)."""
+        return self._distance_km
+
+    def to_model(self, distance_km: float) -> RideTrajectory:
+        """Pack the points into one row for bulk storage."""
+        points = b"".join((
+            np.asarray(self.lats, dtype="<f4").tobytes(),
+            np.asarray(self.lngs, dtype="<f4").tobytes(),
+            np.asarray(self.offsets_ms, dtype="<i4").tobytes(),
+        ))
+        return RideTrajectory(
+            ride_id=self.ride_id,
+            started_at=self.started_at,
+            point_count=len(self),
+            distance_km=distance_km,
+            points=points
+        )
+
+
+class TrajectoryStore:
+    """
+    Trajectories of in-progress rides, fed by driver location pings.
+
+    Memory is bounded by TRAJECTORY_MAX_POINTS per ride and
+    TRAJECTORY_MAX_RIDES rides; past that the oldest trajectory is dropped
+    and its ride falls back to the estimated fare.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rides: Dict[UUID, Trajectory] = {}
+        self._by_driver: Dict[UUID, UUID] = {}
+
+    def __len__(self) -> int:
+        return len(self._rides)
+
+    def start(self, ride_id: UUID, driver_id: UUID, lat: Optional[float] = None, lng: Optional[float] = None) -> Trajectory:
+        """Begin recording a ride, optionally from the driver's current location."""
+        trajectory = Trajectory(ride_id, driver_id)
+        if lat is not None and lng is not None:
+            trajectory.append(lat, lng)
+        with self._lock:
+            self._discard_locked(ride_id)
+            self._discard_locked(self._by_driver.get(driver_id))
+            while len(self._rides) >= settings.TRAJECTORY_MAX_RIDES:
+                self._discard_locked(next(iter(self._rides)))
+            self._rides[ride_id] = trajectory
+            self._by_driver[driver_id] = ride_id
+        return trajectory
+
+    def record(self, driver_id: UUID, lat: float, lng: float) -> bool:
+        """Append a location ping to the driver's ride in progress, if any."""
+        with self._lock:
+            ride_id = self._by_driver.get(driver_id)
+            if ride_id is None:
+                return False
+            return self._rides[ride_id].append(lat, lng)
+
+    def get(self, ride_id: UUID) -> Optional[Trajectory]:
+        """Trajectory being recorded for a ride, without stopping it."""
+        with self._lock:
+            return self._rides.get(ride_id)
+
+    def finish(self, ride_id: UUID) -> Optional[Trajectory]:
+        """Stop recording a ride and hand its trajectory over."""
+        with self._lock:
+            trajectory = self._rides.get(ride_id)
+            self._discard_locked(ride_id)
+            return trajectory
+
+    def _discard_locked(self, ride_id: Optional[UUID]) -> None:
+        trajectory = self._rides.pop(ride_id, None)
+        if trajectory is not None and self._by_driver.get(trajectory.driver_id) == ride_id:
+            del self._by_driver[trajectory.driver_id]
+
+
+# Process-wide store shared by all requests
+trajectory_store = TrajectoryStore()
@@ -1,11 +1,20 @@
-from sqlalchemy import create_engine
+import itertools
+from pathlib import Path
+from typing import Optional, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.core.metrics import TimedAsyncQueuePool, TimedQueuePool, instrument_pool
+from app.core.query_stats import instrument_engine
 
 # Create database engine
 engine = create_engine(
     settings.DATABASE_URL,
+    poolclass=TimedQueuePool,
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20
@@ -14,9 +23,118 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_url(url: str):
+    """Same database as DATABASE_URL, through the asyncpg driver."""
+    async_url = make_url(url.replace("postgres://", "postgresql://", 1))
+    if async_url.drivername.startswith("postgresql"):
+        async_url = async_url.set(drivername="postgresql+asyncpg")
+        # asyncpg takes `ssl` rather than libpq's `sslmode`
+        query = dict(async_url.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+            async_url = async_url.set(query=query)
+    return async_url
+
+
+# Async engine for the hot-path endpoints (rides, driver status, deliveries)
+async_engine = create_async_engine(
+    _async_url(settings.DATABASE_URL),
+    poolclass=TimedAsyncQueuePool,
+    pool_pre_ping=True,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW
+)
+
+# Objects stay usable after commit; handlers never lazy-load in async code
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+# Read replicas (DATABASE_REPLICA_URLS); without any, reads go to the primary
+REPLICA_URLS = [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
+replica_engines = [
+    create_engine(url, poolclass=TimedQueuePool, pool_pre_ping=True, pool_size=10, max_overflow=20)
+    for url in REPLICA_URLS
+]
+
+ReplicaSessions = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    for replica_engine in replica_engines
+]
+
+async_replica_engines = [
+    create_async_engine(
+        _async_url(url),
+        poolclass=TimedAsyncQueuePool,
+        pool_pre_ping=True,
+        pool_size=settings.ASYNC_DB_POOL_SIZE,
+        max_overflow=settings.ASYNC_DB_MAX_OVERFLOW
+    )
+    for url in REPLICA_URLS
+]
+
+AsyncReplicaSessions = [
+    async_sessionmaker(replica_engine, expire_on_commit=False, autoflush=False)
+    for replica_engine in async_replica_engines
+]
+
+_replica_turn = itertools.count()
+
+
+def read_session(use_primary: bool = False):
+    """Session for read-only work: the next replica in turn, or the primary."""
+    if use_primary or not ReplicaSessions:
+        return SessionLocal()
+    return ReplicaSessions[next(_replica_turn) % len(ReplicaSessions)]()
+
+
+def async_read_session(use_primary: bool = False) -> AsyncSession:
+    """Async session for read-only work: the next replica in turn, or the primary."""
+    if use_primary or not AsyncReplicaSessions:
+        return AsyncSessionLocal()
+    return AsyncReplicaSessions[next(_replica_turn) % len(AsyncReplicaSessions)]()
+
+# Every statement is counted per request and slow ones are logged (app/core/query_stats.py)
+for instrumented_engine in [engine, async_engine.sync_engine, *replica_engines] + [
+    replica_engine.sync_engine for replica_engine in async_replica_engines
+]:
+    instrument_engine(instrumented_engine)
+
+# Pool gauges at /metrics (app/core/metrics.py)
+instrument_pool(engine, "primary")
+instrument_pool(async_engine.sync_engine, "primary_async")
+for replica_number, (replica_engine, async_replica_engine) in enumerate(zip(replica_engines, async_replica_engines)):
+    instrument_pool(replica_engine, f"replica{replica_number}")
+    instrument_pool(async_replica_engine.sync_engine, f"replica{replica_number}_async")
+
 # Base class for models
 Base = declarative_base()
 
+# Schema migrations live in alembic/ (run `alembic upgrade head` before starting the app)
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def schema_revisions(db) -> Tuple[Optional[str], str]:
+    """
+    Compare the database schema with the migrations shipped with the code.
+
+    Args:
+        db: Database session
+
+    Returns:
+        (revision the database is at or None, newest revision in alembic/)
+    """
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    head = ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head()
+    try:
+        current = db.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except Exception:
+        db.rollback()
+        current = None
+    return current, head
+
 
 # Dependency to get database session
 def get_db():
@@ -25,3 +143,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,14 +1,22 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from datetime import datetime
 from pathlib import Path
+from prometheus_client import CONTENT_TYPE_LATEST
+from starlette.datastructures import Headers, MutableHeaders
+import time
 
 from app.config import settings
+from app.api.deps import get_principal_from_header
 from app.api.v1 import api_router
-from app.database import engine, Base
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from app.api.v1.admin import is_admin
+from app.core.metrics import REQUEST_LATENCY, REQUESTS_IN_PROGRESS, render_metrics, sample_threadpool
+from app.core.password_pool import PasswordPoolBusy
+from app.core.profiling import PROFILE_HEADER, PROFILE_ID_HEADER, RequestProfile, request_profiles, start_profiler
+from app.core.query_stats import QueryStats, current_query_stats
+from app.core.read_routing import READ_METHODS, recent_writes
 
 # Create upload directory
 Path("uploads/drivers").mkdir(parents=True, exist_ok=True)
@@ -31,42 +39,181 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Profile-Id"],  # pagination and profiling headers
 )
 
-# Startup event - Run migrations automatically
+
+class RequestInstrumentation:
+    """
+    Per-request bookkeeping in one pure ASGI middleware, so every request
+    (location pings included) pays for a single thin layer instead of one
+    BaseHTTPMiddleware task per concern:
+    
+    - number of queries and their time in Server-Timing
+    - per-route latency and in-flight requests for /metrics
+    - profiles for admins sending X-Profile, plus a rate-limited random
+      sample of all requests (see app/core/profiling.py)
+    - who just wrote, so their next reads skip the (possibly lagging) replicas
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        request_headers = Headers(scope=scope)
+        requested = False
+        if PROFILE_HEADER in request_headers:
+            user = await get_principal_from_header(request_headers.get("authorization"))
+            requested = user is not None and is_admin(user)
+        profiler = start_profiler() if requested or request_profiles.should_sample() else None
+        
+        stats = QueryStats(scope["path"], scope)
+        token = current_query_stats.set(stats)
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        sample_threadpool()
+        started = time.perf_counter()
+        status_code = 500
+        
+        async def send_with_headers(message):
+            nonlocal profiler, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing())
+                if profiler is not None:
+                    profile = RequestProfile(
+                        method=method,
+                        path=scope["path"],
+                        route=route_path(scope),
+                        status_code=status_code,
+                        duration_ms=(time.perf_counter() - started) * 1000,
+                        sampled=not requested,
+                        session=profiler.stop()
+                    )
+                    profiler = None
+                    if request_profiles.add(profile) and requested:
+                        headers[PROFILE_ID_HEADER] = profile.id
+                if recent_writes.enabled and method not in READ_METHODS and status_code < 400:
+                    recent_writes.mark_token(request_headers.get("authorization"))
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if profiler is not None:
+                # Failed before responding; nothing to keep
+                profiler.stop()
+            current_query_stats.reset(token)
+            in_progress.dec()
+            REQUEST_LATENCY.labels(method, route_path(scope), str(status_code)).observe(time.perf_counter() - started)
+
+
+def route_path(scope) -> str:
+    """Route template of a request; unknown paths share one label to keep the label set small."""
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+app.add_middleware(RequestInstrumentation)
+
+
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy_handler(request: Request, exc: PasswordPoolBusy):
+    """Shed password work fast instead of queueing it without bound."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many login attempts in progress, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+
+# Startup event - check the schema version and warm in-memory state
 @app.on_event("startup")
 async def startup_event():
-    """Run database migrations on startup."""
-    from sqlalchemy import text
-    from app.database import SessionLocal
+    """Check the schema version and start background workers."""
+    from app.database import SessionLocal, schema_revisions
     
+    # Migrations run before the app starts (`alembic upgrade head`); only compare versions here
     db = SessionLocal()
     try:
-        print("🔄 Running database migrations...")
-        
-        migrations = [
-            "ALTER TABLE drivers ADD COLUMN IF NOT EXISTS online_status VARCHAR(20) DEFAULT 'offline'",
-            "ALTER TABLE drivers ADD COLUMN IF NOT EXISTS current_location_lat FLOAT",
-            "ALTER TABLE drivers ADD COLUMN IF NOT EXISTS current_location_lng FLOAT",
-            "ALTER TABLE drivers ADD COLUMN IF NOT EXISTS last_location_update TIMESTAMP",
-            "ALTER TABLE rides ADD COLUMN IF NOT EXISTS assigned_driver_id UUID REFERENCES drivers(id)",
-            "ALTER TABLE rides ADD COLUMN IF NOT EXISTS driver_response_deadline TIMESTAMP",
-            "CREATE INDEX IF NOT EXISTS idx_drivers_online_status ON drivers(online_status)",
-        ]
-        
-        for migration in migrations:
-            try:
-                db.execute(text(migration))
-            except Exception:
-                pass
-        
-        db.commit()
-        print("✅ Migrations completed!")
-    except Exception as e:
-        print(f"❌ Migration error: {str(e)}")
-        db.rollback()
+        current, head = schema_revisions(db)
+        if current == head:
+            print(f"✅ Database schema up to date (revision {head})")
+        else:
+            print(f"❌ Database schema is at revision {current}, code expects {head}: run `alembic upgrade head`")
+    finally:
+        db.close()
+    
+    # Warm the in-memory index of online drivers used for ride matching
+    from app.core.driver_index import load_driver_index
+    from app.core.dispatcher import ride_dispatcher
+    from app.core.matching import recover_offer_deadlines
+    from app.core.timer_wheel import timer_wheel
+    from app.core.location_buffer import location_buffer
+    from app.core.pricing import pricing_engine
+    from app.core.surge import load_surge_supply, surge_monitor
+    from app.core.password_pool import password_pool
+    from app.core.archive import missing_partitions, trip_archiver
+    from app.utils.partitions import partition_name
+    
+    db = SessionLocal()
+    try:
+        # Partitions come from the migrations and the archiver loop; only check this month's here
+        missing = missing_partitions(db, datetime.utcnow(), datetime.utcnow())
+        if missing:
+            names = ", ".join(partition_name(table, month) for table, month in missing)
+            print(f"❌ Trip partitions missing for this month ({names}); the trip archiver creates them now")
+        rates = pricing_engine.reload(db)
+        print(f"✅ Pricing rates loaded ({rates} stored overrides)")
+        count = load_driver_index(db)
+        print(f"✅ Driver index loaded ({count} online drivers)")
+        load_surge_supply(db)
+        armed = recover_offer_deadlines(db)
+        print(f"✅ Ride offer timers armed ({armed} outstanding offers)")
+        if ride_dispatcher.enabled:
+            queued = ride_dispatcher.recover(db)
+            print(f"✅ Ride dispatcher started ({queued} rides waiting for a driver)")
     finally:
         db.close()
+    
+    timer_wheel.start()
+    ride_dispatcher.start()
+    location_buffer.start()
+    pricing_engine.start()
+    surge_monitor.start()
+    password_pool.start()
+    trip_archiver.start(run_now=bool(missing))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers."""
+    from app.core.dispatcher import ride_dispatcher
+    from app.core.timer_wheel import timer_wheel
+    from app.core.location_buffer import location_buffer
+    from app.core.pricing import pricing_engine
+    from app.core.surge import surge_monitor
+    from app.core.password_pool import password_pool
+    from app.core.archive import trip_archiver
+    from app.database import async_engine, async_replica_engines
+    from app.core.metrics import mark_worker_stopped
+    
+    mark_worker_stopped()
+    await trip_archiver.stop()
+    password_pool.stop()
+    await surge_monitor.stop()
+    await pricing_engine.stop()
+    await ride_dispatcher.stop()
+    await timer_wheel.stop()
+    await location_buffer.stop()
+    await async_engine.dispose()
+    for replica_engine in async_replica_engines:
+        await replica_engine.dispose()
 
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
@@ -82,6 +229,12 @@ def health_check():
     return {"status": "healthy", "service": "DOT API"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/")
 def root():
     """Root endpoint."""
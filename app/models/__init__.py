@@ -2,6 +2,11 @@ from app.models.user import User, UserRole
 from app.models.ride import Ride, RideStatus
 from app.models.delivery import Delivery, DeliveryStatus
 from app.models.driver import Driver, DriverType, DriverStatus, DriverOnlineStatus, VehicleType
+from app.models.driver_live_state import DriverLiveState
+from app.models.ride_trajectory import RideTrajectory
+from app.models.pricing_rate import PricingRate
+from app.models.trip_archive import RideArchive, DeliveryArchive, RideArchiveEntry, DeliveryArchiveEntry
+from app.models import indexes  # noqa: F401  (registers query-specific indexes on the tables)
 
 __all__ = [
     "User",
@@ -15,4 +20,11 @@ __all__ = [
     "DriverStatus",
     "DriverOnlineStatus",
     "VehicleType",
+    "DriverLiveState",
+    "RideTrajectory",
+    "PricingRate",
+    "RideArchive",
+    "DeliveryArchive",
+    "RideArchiveEntry",
+    "DeliveryArchiveEntry",
 ]
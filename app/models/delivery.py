@@ -51,13 +51,19 @@ class Delivery(Base):
     distance_km = Column(Float, nullable=False)
     delivery_fee = Column(Float, nullable=False)
     total_cost = Column(Float, nullable=False)
+    surge_multiplier = Column(Float, default=1.0, nullable=False)
     
     # Status
     status = Column(SQLEnum(DeliveryStatus), default=DeliveryStatus.PENDING, nullable=False, index=True)
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="deliveries", foreign_keys=[user_id])
+    
+    # Partitioned by month on created_at, which the primary key must include;
+    # deliveries are still identified by id alone
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+    __mapper_args__ = {"primary_key": [id]}
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Float, Enum as SQLEnum, ForeignKey, DateTime
+from sqlalchemy import Column, String, Integer, Enum as SQLEnum, ForeignKey, DateTime
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -70,15 +70,12 @@ class Driver(Base):
     status = Column(SQLEnum(DriverStatus), default=DriverStatus.PENDING, nullable=False, index=True)
     rejection_reason = Column(String, nullable=True)
     
-    # Online Status & Location Tracking
-    online_status = Column(SQLEnum(DriverOnlineStatus), default=DriverOnlineStatus.OFFLINE, nullable=False)
-    current_location_lat = Column(Float, nullable=True)
-    current_location_lng = Column(Float, nullable=True)
-    last_location_update = Column(DateTime, nullable=True)
-    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # Relationships
     user = relationship("User", backref="driver_profile")
+    live_state = relationship(
+        "DriverLiveState", back_populates="driver", uselist=False, passive_deletes=True
+    )
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Float, DateTime, Enum as SQLEnum, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.database import Base
+from app.models.driver import DriverOnlineStatus
+
+
+# High-churn driver state, kept apart from the wide profile row: location
+# pings and status toggles rewrite only this narrow tuple. No updated_at and
+# no index on the coordinates, so those writes stay HOT updates.
+class DriverLiveState(Base):
+    __tablename__ = "driver_live_state"
+    
+    driver_id = Column(UUID(as_uuid=True), ForeignKey("drivers.id", ondelete="CASCADE"), primary_key=True)
+    
+    # Online Status & Location Tracking
+    online_status = Column(SQLEnum(DriverOnlineStatus), default=DriverOnlineStatus.OFFLINE, nullable=False)
+    current_location_lat = Column(Float, nullable=True)
+    current_location_lng = Column(Float, nullable=True)
+    last_location_update = Column(DateTime, nullable=True)
+    
+    # Relationships
+    driver = relationship("Driver", back_populates="live_state")
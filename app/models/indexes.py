@@ -0,0 +1,55 @@
+# Indexes for specific query shapes (single-column ones are declared on the columns)
+from sqlalchemy import Index
+
+from app.models.delivery import Delivery
+from app.models.driver import Driver, DriverOnlineStatus
+from app.models.driver_live_state import DriverLiveState
+from app.models.ride import Ride, RideStatus
+from app.models.trip_archive import DeliveryArchive, RideArchive
+
+# Online drivers: driver index and surge supply loads.
+# Partial, so it only holds online drivers. Coordinates are deliberately not
+# indexed: location flushes rewrite them every second, and any indexed
+# column would turn those HOT updates into index writes.
+live_state_online = Index(
+    "ix_driver_live_state_online",
+    DriverLiveState.driver_id,
+    postgresql_where=DriverLiveState.online_status == DriverOnlineStatus.ONLINE
+)
+
+# Admin driver lists: one status, keyset pages on (created_at, id)
+drivers_status_created_at = Index(
+    "ix_drivers_status_created_at_id",
+    Driver.status,
+    Driver.created_at,
+    Driver.id
+)
+
+# Open offers: /rides/pending (per driver, deadline in the future) and offer
+# timer recovery. Pending rides are a sliver of the table.
+rides_pending_offers = Index(
+    "ix_rides_pending_offers",
+    Ride.assigned_driver_id,
+    Ride.driver_response_deadline,
+    postgresql_where=Ride.status == RideStatus.PENDING
+)
+
+# Delivery history: one user, keyset pages on (created_at, id) newest first
+deliveries_user_created_at = Index(
+    "ix_deliveries_user_created_at_id",
+    Delivery.user_id,
+    Delivery.created_at,
+    Delivery.id
+)
+
+# Archived history: one user's batches, newest first
+ride_archive_user = Index(
+    "ix_ride_archive_user_last_created_at",
+    RideArchive.user_id,
+    RideArchive.last_created_at
+)
+delivery_archive_user = Index(
+    "ix_delivery_archive_user_last_created_at",
+    DeliveryArchive.user_id,
+    DeliveryArchive.last_created_at
+)
@@ -0,0 +1,26 @@
+import uuid
+from sqlalchemy import Column, Float, DateTime, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+
+from app.database import Base
+from app.models.driver import DriverType, VehicleType
+
+
+class PricingRate(Base):
+    __tablename__ = "pricing_rates"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    
+    # Which trips the rate applies to; no vehicle type means any vehicle of that service
+    driver_type = Column(SQLEnum(DriverType), nullable=False, index=True)
+    vehicle_type = Column(SQLEnum(VehicleType), nullable=True)
+    
+    # Fare = max(minimum_fare, base_fare + per_km * distance_km), in SYP
+    base_fare = Column(Float, default=0, nullable=False)
+    per_km = Column(Float, nullable=False)
+    minimum_fare = Column(Float, default=0, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, Float, DateTime, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+
+from app.database import Base
+
+
+class RideTrajectory(Base):
+    __tablename__ = "ride_trajectories"
+    
+    # No foreign key: rides is partitioned, so rides.id alone has no unique constraint
+    ride_id = Column(UUID(as_uuid=True), primary_key=True)
+    
+    # Path travelled between start and completion
+    started_at = Column(DateTime, nullable=False)
+    point_count = Column(Integer, nullable=False)
+    distance_km = Column(Float, nullable=False)
+    
+    # Packed little-endian arrays, one after another:
+    # float32 lats, float32 lngs, int32 milliseconds since started_at
+    points = Column(LargeBinary, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
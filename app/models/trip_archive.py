@@ -0,0 +1,49 @@
+import uuid
+from sqlalchemy import Column, Integer, Date, DateTime, LargeBinary, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+
+from app.database import Base
+
+
+class TripArchiveMixin:
+    """Completed or cancelled trips of one user from one month, packed and compressed."""
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    
+    # Trips in the batch
+    month = Column(Date, nullable=False)
+    trip_count = Column(Integer, nullable=False)
+    first_created_at = Column(DateTime, nullable=False)
+    last_created_at = Column(DateTime, nullable=False)
+    
+    # zlib-compressed JSON: {"columns": [...], "rows": [[...], ...]}
+    payload = Column(LargeBinary, nullable=False)
+    
+    # Timestamps
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class RideArchive(TripArchiveMixin, Base):
+    __tablename__ = "ride_archive"
+
+
+class DeliveryArchive(TripArchiveMixin, Base):
+    __tablename__ = "delivery_archive"
+
+
+class RideArchiveEntry(Base):
+    """Batch holding an archived ride, so a lookup opens only that one."""
+    __tablename__ = "ride_archive_trips"
+    
+    trip_id = Column(UUID(as_uuid=True), primary_key=True)
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("ride_archive.id", ondelete="CASCADE"), nullable=False)
+
+
+class DeliveryArchiveEntry(Base):
+    """Batch holding an archived delivery, so a lookup opens only that one."""
+    __tablename__ = "delivery_archive_trips"
+    
+    trip_id = Column(UUID(as_uuid=True), primary_key=True)
+    batch_id = Column(UUID(as_uuid=True), ForeignKey("delivery_archive.id", ondelete="CASCADE"), nullable=False)
@@ -2,7 +2,7 @@ from app.schemas.user import UserBase, UserCreate, UserLogin, UserUpdate, UserRe
 from app.schemas.auth import Token, TokenData
 from app.schemas.ride import RideCreate, RideResponse, RideStatusUpdate
 from app.schemas.delivery import DeliveryCreate, DeliveryResponse, DeliveryStatusUpdate
-from app.schemas.driver import DriverRegister, DriverResponse, DriverStatusResponse
+from app.schemas.driver import DriverRegister, DriverResponse, DriverListItem, DriverStatusResponse
 
 __all__ = [
     "UserBase",
@@ -20,5 +20,6 @@ __all__ = [
     "DeliveryStatusUpdate",
     "DriverRegister",
     "DriverResponse",
+    "DriverListItem",
     "DriverStatusResponse",
 ]
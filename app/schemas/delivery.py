@@ -59,6 +59,7 @@ class DeliveryResponse(BaseModel):
     distance_km: float
     delivery_fee: float
     total_cost: float
+    surge_multiplier: Optional[float] = 1.0
     
     # Status
     status: str
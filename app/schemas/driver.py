@@ -63,6 +63,22 @@ class DriverResponse(BaseModel):
         from_attributes = True
 
 
+class DriverListItem(BaseModel):
+    """Columns shown in the admin driver lists; full details come from /admin/drivers/{id}."""
+    id: UUID
+    user_id: UUID
+    driver_type: str
+    name: str
+    phone: str
+    vehicle_type: str
+    vehicle_number: str
+    status: str
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
 class DriverStatusResponse(BaseModel):
     status: str
     rejection_reason: Optional[str] = None
@@ -27,6 +27,7 @@ class RideResponse(BaseModel):
     distance_km: float
     estimated_price: float
     final_price: Optional[float]
+    surge_multiplier: Optional[float] = 1.0
     status: str
     created_at: datetime
     updated_at: datetime
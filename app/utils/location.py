@@ -1,9 +1,18 @@
+# Utility functions
 import math
+from typing import Sequence, Union
 
+import numpy as np
 
-def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+# Earth radius in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+ArrayLike = Union[Sequence[float], np.ndarray]
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """
-    Calculate distance between two coordinates using Haversine formula.
+    Scalar Haversine distance without rounding.
     
     Args:
         lat1, lng1: First coordinate
@@ -12,23 +21,97 @@ def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> fl
     Returns:
         Distance in kilometers
     """
-    # Earth radius in kilometers
-    R = 6371.0
-    
-    # Convert to radians
     lat1_rad = math.radians(lat1)
-    lng1_rad = math.radians(lng1)
     lat2_rad = math.radians(lat2)
-    lng2_rad = math.radians(lng2)
-    
-    # Differences
     dlat = lat2_rad - lat1_rad
-    dlng = lng2_rad - lng1_rad
+    dlng = math.radians(lng2 - lng1)
     
-    # Haversine formula
     a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     
-    distance = R * c
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Calculate distance between two coordinates using Haversine formula.
+    
+    Args:
+        lat1, lng1: First coordinate
+        lat2, lng2: Second coordinate
+        
+    Returns:
+        Distance in kilometers, rounded to 10 meters
+    """
+    return round(haversine_km(lat1, lng1, lat2, lng2), 2)
+
+
+def distances_from(lat: float, lng: float, lats: ArrayLike, lngs: ArrayLike) -> np.ndarray:
+    """
+    Haversine distances from one origin to N points in a single vectorized pass.
+    
+    Args:
+        lat, lng: Origin coordinate
+        lats, lngs: Point coordinates (length N)
+        
+    Returns:
+        Array of N distances in kilometers
+    """
+    lat_rad = math.radians(lat)
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lats_rad - lat_rad
+    dlng = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+    
+    a = np.sin(dlat / 2)**2 + math.cos(lat_rad) * np.cos(lats_rad) * np.sin(dlng / 2)**2
+    
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def distance_matrix(
+    lats1: ArrayLike,
+    lngs1: ArrayLike,
+    lats2: ArrayLike,
+    lngs2: ArrayLike
+) -> np.ndarray:
+    """
+    Haversine distances between every pair of N origins and M points.
+    
+    Args:
+        lats1, lngs1: Origin coordinates (length N)
+        lats2, lngs2: Point coordinates (length M)
+        
+    Returns:
+        N x M array of distances in kilometers
+    """
+    lats1_rad = np.radians(np.asarray(lats1, dtype=np.float64))[:, np.newaxis]
+    lats2_rad = np.radians(np.asarray(lats2, dtype=np.float64))[np.newaxis, :]
+    dlat = lats2_rad - lats1_rad
+    dlng = np.radians(
+        np.asarray(lngs2, dtype=np.float64)[np.newaxis, :]
+        - np.asarray(lngs1, dtype=np.float64)[:, np.newaxis]
+    )
+    
+    a = np.sin(dlat / 2)**2 + np.cos(lats1_rad) * np.cos(lats2_rad) * np.sin(dlng / 2)**2
+    
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def path_length(lats: ArrayLike, lngs: ArrayLike) -> float:
+    """
+    Total Haversine length of a polyline in a single vectorized pass.
+    
+    Args:
+        lats, lngs: Point coordinates in travel order (length N)
+        
+    Returns:
+        Sum of the N - 1 segment lengths in kilometers
+    """
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs_rad = np.radians(np.asarray(lngs, dtype=np.float64))
+    if lats_rad.size < 2:
+        return 0.0
+    dlat = np.diff(lats_rad)
+    dlng = np.diff(lngs_rad)
+    
+    a = np.sin(dlat / 2)**2 + np.cos(lats_rad[:-1]) * np.cos(lats_rad[1:]) * np.sin(dlng / 2)**2
     
-    return round(distance, 2)
+    return float(2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0))).sum())
@@ -0,0 +1,33 @@
+# Monthly range partitions of the trip tables
+import re
+from datetime import date, datetime
+from typing import Optional, Union
+
+# Tables partitioned by month on created_at
+PARTITIONED_TABLES = ("rides", "deliveries")
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def month_start(value: Union[date, datetime]) -> date:
+    """First day of the month containing `value`."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    """Shift a month start by a number of months (negative goes back)."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Name of the partition holding `table` rows created in `month`, e.g. rides_p202610."""
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month covered by a partition named by partition_name, or None for any other table."""
+    match = _PARTITION_NAME.match(name)
+    if match is None or match.group("table") not in PARTITIONED_TABLES:
+        return None
+    return date(int(match.group("year")), int(match.group("month")), 1)
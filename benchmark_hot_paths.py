@@ -0,0 +1,77 @@
+"""
+Script to load test the hot-path endpoints of a running server.
+Run it before and after a change to compare throughput and latency.
+
+Usage:
+    python benchmark_hot_paths.py --url http://localhost:8000 --token <JWT> \
+        --path /api/v1/driver-status/me/status --path /api/v1/deliveries \
+        --concurrency 50 --requests 2000
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def timed_request(url, token, method="GET", body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method)
+    request.add_header("Authorization", f"Bearer {token}")
+    if data is not None:
+        request.add_header("Content-Type", "application/json")
+
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+
+def benchmark(url, token, method, body, concurrency, total):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Warm up connections and caches
+        list(pool.map(lambda _: timed_request(url, token, method, body), range(concurrency)))
+
+        started = time.perf_counter()
+        results = list(pool.map(lambda _: timed_request(url, token, method, body), range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(duration for _, duration in results)
+    errors = sum(1 for status, _ in results if not 200 <= status < 300)
+
+    print(f"{method} {url}")
+    print(f"   Requests: {total} ({concurrency} concurrent), errors: {errors}")
+    print(f"   Throughput: {total / elapsed:.1f} req/s")
+    print(f"   Latency: p50 {percentile(latencies, 0.50):.1f} ms, "
+          f"p99 {percentile(latencies, 0.99):.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test hot-path endpoints")
+    parser.add_argument("--url", default="http://localhost:8000", help="Server base URL")
+    parser.add_argument("--token", required=True, help="Bearer token (driver token for driver endpoints)")
+    parser.add_argument("--path", action="append", help="Endpoint path, repeatable")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--body", help="JSON request body")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    paths = args.path or ["/api/v1/driver-status/me/status"]
+    body = json.loads(args.body) if args.body else None
+    for path in paths:
+        benchmark(args.url.rstrip("/") + path, args.token, args.method.upper(), body, args.concurrency, args.requests)
+
+if __name__ == "__main__":
+    main()
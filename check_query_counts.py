@@ -0,0 +1,109 @@
+"""
+Script to check that the hot endpoints stay within their query budgets, so
+an N+1 regression fails the build. Run it in CI next to check_query_plans.py.
+Creates a few throwaway users, a driver and deliveries, calls each endpoint
+in-process with cold caches, compares the query count it reports in
+Server-Timing with its budget, and deletes what it created.
+Run it against a migrated Postgres database (`alembic upgrade head`),
+ideally a scratch copy rather than production.
+"""
+import sys
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.core.query_stats import assert_max_queries
+from app.core.security import create_access_token
+from app.database import SessionLocal
+from app.main import app
+from app.models import (
+    Delivery, DeliveryStatus, Driver, DriverLiveState, DriverStatus, DriverType, User, VehicleType
+)
+
+SEED_DELIVERIES = 30  # more than one history page
+
+
+def seed(db) -> dict:
+    """Create the users, driver and deliveries the endpoints read. Returns their ids."""
+    def user(role):
+        created = User(phone="qc" + uuid.uuid4().hex[:12], name="Query check", role=role, password_hash="x")
+        db.add(created)
+        return created
+
+    customer, admin, driver_user = user("user"), user("admin"), user("user")
+    db.flush()
+    driver = Driver(
+        user_id=driver_user.id, driver_type=DriverType.TAXI, name="Query check", national_id="qc" + uuid.uuid4().hex[:9],
+        phone="0999000000", age=30, national_id_photo="x", license_photo="x", selfie_with_id_photo="x",
+        vehicle_type=VehicleType.SEDAN, vehicle_number="qc", vehicle_photo="x",
+        status=DriverStatus.APPROVED, live_state=DriverLiveState()
+    )
+    deliveries = [
+        Delivery(
+            user_id=customer.id, order_type="package", pickup_lat=33.5, pickup_lng=36.3, pickup_address="A",
+            sender_name="S", delivery_lat=33.6, delivery_lng=36.3, delivery_address="B", receiver_name="R",
+            receiver_phone="0999123456", receiver_national_id="12345678901", driver_pays=False, product_amount=0,
+            distance_km=1, delivery_fee=1000, total_cost=1000, surge_multiplier=1.0, status=DeliveryStatus.DELIVERED
+        )
+        for _ in range(SEED_DELIVERIES)
+    ]
+    db.add(driver)
+    db.add_all(deliveries)
+    db.commit()
+    return {
+        "customer": customer.id,
+        "admin": admin.id,
+        "driver_user": driver_user.id,
+        "delivery": deliveries[0].id,
+    }
+
+
+def cleanup(db, ids: dict) -> None:
+    users = [ids["customer"], ids["admin"], ids["driver_user"]]
+    db.query(Delivery).filter(Delivery.user_id.in_(users)).delete(synchronize_session=False)
+    db.query(Driver).filter(Driver.user_id.in_(users)).delete(synchronize_session=False)
+    db.query(User).filter(User.id.in_(users)).delete(synchronize_session=False)
+    db.commit()
+
+
+def budgets(ids: dict) -> list:
+    """(user, method, path, JSON body, maximum queries) per endpoint, first call with cold caches."""
+    return [
+        ("customer", "GET", "/api/v1/users/me", None, 1),
+        ("customer", "GET", "/api/v1/deliveries", None, 1),
+        ("customer", "GET", f"/api/v1/deliveries/{ids['delivery']}", None, 1),
+        ("driver_user", "GET", "/api/v1/driver-status/me/status", None, 2),
+        ("driver_user", "POST", "/api/v1/driver-status/location", {"latitude": 33.51, "longitude": 36.31}, 0),
+        ("driver_user", "GET", "/api/v1/rides/pending", None, 2),
+        ("admin", "GET", "/api/v1/admin/drivers/approved", None, 2),
+    ]
+
+
+def check_query_counts() -> bool:
+    failures = 0
+    db = SessionLocal()
+    try:
+        print("🔄 Seeding test data...")
+        ids = seed(db)
+        # One event loop for all requests, as under uvicorn
+        with TestClient(app) as client:
+            for user, method, path, body, limit in budgets(ids):
+                headers = {"Authorization": "Bearer " + create_access_token({"sub": str(ids[user])})}
+                response = client.request(method, path, headers=headers, json=body)
+                try:
+                    assert response.status_code < 400, f"{method} {path} answered {response.status_code}"
+                    assert_max_queries(response, limit)
+                    print(f"✅ {method} {path}: {response.headers['server-timing']}")
+                except (AssertionError, ValueError) as e:
+                    failures += 1
+                    print(f"❌ {e}")
+    finally:
+        db.rollback()
+        if "ids" in locals():
+            cleanup(db, ids)
+        db.close()
+
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_counts() else 1)
@@ -0,0 +1,209 @@
+"""
+Script to check that the hot queries are served by their indexes.
+Seeds a realistic dataset inside a transaction, runs EXPLAIN on each query
+and rolls everything back, so it leaves the database as it found it.
+Run it against a migrated Postgres database (`alembic upgrade head`),
+ideally a scratch copy rather than production.
+"""
+import json
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from app.core.archive import create_partitions
+from app.database import engine
+from app.models import (
+    Delivery, Driver, DriverLiveState, DriverOnlineStatus, DriverStatus, DriverType, Ride, RideStatus
+)
+
+SEED_USERS = 20000
+SEED_DRIVERS = 5000  # 1 in 25 online
+SEED_RIDES = 100000  # 1 in 500 pending
+SEED_DELIVERIES = 50000  # concentrated on 100 business customers
+
+SEED_SQL = [
+    f"""
+    INSERT INTO users (id, phone, name, role, password_hash, created_at, updated_at)
+    SELECT gen_random_uuid(), 'seed' || n, 'Seed user', 'USER', 'x',
+           now() - n * interval '1 minute', now()
+    FROM generate_series(1, {SEED_USERS}) AS n
+    """,
+    f"""
+    INSERT INTO drivers (
+        id, user_id, driver_type, name, national_id, phone, age,
+        national_id_photo, license_photo, selfie_with_id_photo,
+        vehicle_type, vehicle_number, vehicle_photo, status, created_at, updated_at
+    )
+    SELECT gen_random_uuid(), u.id,
+           (CASE WHEN n % 3 = 0 THEN 'DELIVERY' ELSE 'TAXI' END)::drivertype,
+           'Seed driver', 'seed' || n, '0999000000', 30, 'x', 'x', 'x',
+           'SEDAN', 'seed' || n, 'x',
+           (CASE WHEN n % 10 = 0 THEN 'PENDING' ELSE 'APPROVED' END)::driverstatus,
+           now() - n * interval '1 hour', now()
+    FROM (SELECT id, row_number() OVER () AS n FROM users WHERE phone LIKE 'seed%' LIMIT {SEED_DRIVERS}) AS u
+    """,
+    """
+    INSERT INTO driver_live_state (driver_id, online_status, current_location_lat, current_location_lng)
+    SELECT id,
+           (CASE WHEN substr(national_id, 5)::int % 25 = 1 THEN 'ONLINE' ELSE 'OFFLINE' END)::driveronlinestatus,
+           33.5 + random() * 0.1, 36.3 + random() * 0.1
+    FROM drivers WHERE national_id LIKE 'seed%'
+    """,
+    f"""
+    INSERT INTO rides (
+        id, user_id, driver_id, assigned_driver_id, driver_response_deadline,
+        pickup_lat, pickup_lng, pickup_address, destination_lat, destination_lng, destination_address,
+        distance_km, estimated_price, status, surge_multiplier, created_at, updated_at
+    )
+    SELECT gen_random_uuid(), u.id, d.user_id, d.id,
+           now() + (CASE WHEN n % 500 = 0 THEN interval '30 seconds' ELSE -interval '1 day' END),
+           33.5, 36.3, 'a', 33.55, 36.35, 'b', 7.0, 19000,
+           (CASE WHEN n % 500 = 0 THEN 'PENDING' ELSE 'COMPLETED' END)::ridestatus, 1.0,
+           now() - n * interval '1 minute', now()
+    FROM generate_series(1, {SEED_RIDES}) AS n
+    JOIN LATERAL (SELECT id FROM users WHERE phone = 'seed' || (n % {SEED_USERS} + 1)) AS u ON true
+    JOIN LATERAL (
+        SELECT id, user_id FROM drivers WHERE national_id = 'seed' || (n % {SEED_DRIVERS} + 1)
+    ) AS d ON true
+    """,
+    f"""
+    INSERT INTO deliveries (
+        id, user_id, order_type, pickup_lat, pickup_lng, pickup_address, sender_name,
+        delivery_lat, delivery_lng, delivery_address, receiver_name, receiver_phone, receiver_national_id,
+        driver_pays, product_amount, distance_km, delivery_fee, total_cost, surge_multiplier,
+        status, created_at, updated_at
+    )
+    SELECT gen_random_uuid(), u.id, 'package', 33.5, 36.3, 'a', 'Sender',
+           33.6, 36.3, 'b', 'Receiver', '0999000000', '00000000000',
+           false, 0, 11.1, 55000, 55000, 1.0, 'DELIVERED',
+           now() - n * interval '1 minute', now()
+    FROM generate_series(1, {SEED_DELIVERIES}) AS n
+    JOIN LATERAL (SELECT id FROM users WHERE phone = 'seed' || (n % 100 + 1)) AS u ON true
+    """,
+    "ANALYZE users",
+    "ANALYZE drivers",
+    "ANALYZE driver_live_state",
+    "ANALYZE rides",
+    "ANALYZE deliveries",
+]
+
+
+def hot_queries(conn):
+    """(name, statement, indexes allowed to serve it), mirroring the queries in app/."""
+    driver_id, busy_user_id = conn.execute(text(
+        "SELECT d.id, (SELECT id FROM users WHERE phone = 'seed1') "
+        "FROM drivers d JOIN rides r ON r.assigned_driver_id = d.id "
+        "WHERE r.status = 'PENDING' LIMIT 1"
+    )).one()
+    now = datetime.utcnow()
+
+    return [
+        (
+            "driver index load (load_driver_index)",
+            select(
+                Driver.id, Driver.user_id, DriverLiveState.current_location_lat, DriverLiveState.current_location_lng
+            ).join(DriverLiveState, DriverLiveState.driver_id == Driver.id).where(
+                DriverLiveState.online_status == DriverOnlineStatus.ONLINE,
+                Driver.status == DriverStatus.APPROVED,
+                Driver.driver_type == DriverType.TAXI
+            ),
+            {"ix_driver_live_state_online"},
+        ),
+        (
+            "surge supply load (load_surge_supply)",
+            select(
+                Driver.id, Driver.driver_type, DriverLiveState.current_location_lat, DriverLiveState.current_location_lng
+            ).join(DriverLiveState, DriverLiveState.driver_id == Driver.id).where(
+                DriverLiveState.online_status == DriverOnlineStatus.ONLINE,
+                Driver.status == DriverStatus.APPROVED
+            ),
+            {"ix_driver_live_state_online"},
+        ),
+        (
+            "pending offers of a driver (GET /rides/pending)",
+            select(Ride).where(
+                Ride.assigned_driver_id == driver_id,
+                Ride.status == RideStatus.PENDING,
+                Ride.driver_response_deadline > now
+            ),
+            {"ix_rides_pending_offers"},
+        ),
+        (
+            "outstanding offer deadlines (recover_offer_deadlines)",
+            select(Ride.id, Ride.driver_response_deadline).where(
+                Ride.status == RideStatus.PENDING,
+                Ride.driver_response_deadline.isnot(None)
+            ),
+            # Runs once at startup and reads every pending ride either way
+            {"ix_rides_pending_offers", "ix_rides_status"},
+        ),
+        (
+            "admin driver list page (GET /admin/drivers/approved)",
+            select(Driver.id, Driver.name, Driver.created_at).where(
+                Driver.status == DriverStatus.APPROVED
+            ).order_by(Driver.created_at, Driver.id).limit(51),
+            {"ix_drivers_status_created_at_id"},
+        ),
+        (
+            "delivery history page (GET /deliveries)",
+            select(Delivery).where(
+                Delivery.user_id == busy_user_id
+            ).order_by(Delivery.created_at.desc(), Delivery.id.desc()).limit(21),
+            {"ix_deliveries_user_created_at_id"},
+        ),
+    ]
+
+
+def plan_indexes(plan: dict) -> set:
+    """Names of the indexes an EXPLAIN (FORMAT JSON) plan scans."""
+    found = set()
+    if plan.get("Node Type") in ("Index Scan", "Index Only Scan", "Bitmap Index Scan"):
+        found.add(plan.get("Index Name"))
+    for child in plan.get("Plans", []):
+        found |= plan_indexes(child)
+    return found
+
+
+def parent_indexes(conn) -> dict:
+    """Partition index name -> name of the index declared on the partitioned table."""
+    return dict(conn.execute(text(
+        "SELECT child.relname, parent.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "WHERE child.relkind = 'i'"
+    )).all())
+
+
+def check_query_plans() -> bool:
+    failures = 0
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            print("🔄 Seeding dataset...")
+            now = datetime.utcnow()
+            create_partitions(conn, now - timedelta(minutes=max(SEED_RIDES, SEED_DELIVERIES)), now)
+            for statement in SEED_SQL:
+                conn.execute(text(statement))
+            parents = parent_indexes(conn)
+
+            for name, statement, expected_indexes in hot_queries(conn):
+                sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+                plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                used = {parents.get(index, index) for index in plan_indexes(plan[0]["Plan"])}
+
+                if used & expected_indexes:
+                    print(f"✅ {name}: {', '.join(sorted(used & expected_indexes))}")
+                else:
+                    failures += 1
+                    print(f"❌ {name}: expected {' or '.join(sorted(expected_indexes))}, plan uses {sorted(used) or 'no index'}")
+                    print(json.dumps(plan[0]["Plan"], indent=2))
+        finally:
+            transaction.rollback()
+
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_plans() else 1)